@@ -0,0 +1,57 @@
+import argparse
+import time
+
+from common import nn_model, load_sample_flows
+
+
+def score(flows, batch_size, explanation_mode, cascade_enabled):
+    """
+    Score every flow in batches and return the predictions and the throughput in rows/s.
+    """
+    nn_model.CASCADE_ENABLED = cascade_enabled
+    # Start each run without cached explanations from the previous one
+    nn_model.explanation_cache.clear()
+    predictions = []
+    start = time.perf_counter()
+    for batch_start in range(0, len(flows), batch_size):
+        processed = nn_model.process_network_traffic(flows.iloc[batch_start:batch_start + batch_size], explanation_mode)
+        predictions.extend(processed['prediction'])
+    return predictions, len(flows) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and agreement of the benign pre-filter cascade.")
+    parser.add_argument('--rows', type=int, default=2000, help="Number of flows to score")
+    parser.add_argument('--batch-size', type=int, default=64, help="Flows per process_network_traffic call")
+    parser.add_argument('--explain', default='shap', choices=['shap', 'fast', 'none'], help="Explanation mode")
+    args = parser.parse_args()
+
+    if nn_model.get_cascade() is None:
+        raise SystemExit("Train the pre-filter first: python models/cascade.py")
+
+    flows = load_sample_flows(args.rows)
+    # Warm up the explainer and compiled forests outside the timed runs
+    score(flows.iloc[:args.batch_size], args.batch_size, args.explain, True)
+    score(flows.iloc[:args.batch_size], args.batch_size, args.explain, False)
+
+    full_predictions, full_throughput = score(flows, args.batch_size, args.explain, False)
+    cascade_predictions, cascade_throughput = score(flows, args.batch_size, args.explain, True)
+
+    benign_label = nn_model.get_cascade().benign_label
+    agreement = sum(full == cascade for full, cascade in zip(full_predictions, cascade_predictions)) / len(flows)
+    missed_attacks = sum(
+        full != benign_label and cascade == benign_label for full, cascade in zip(full_predictions, cascade_predictions)
+    )
+    cleared, _ = nn_model.get_cascade().clear(nn_model.scaler.transform(
+        flows.reindex(columns=nn_model.model_columns, fill_value=0)
+    ))
+
+    print(f"Full model:  {full_throughput:10.1f} rows/s")
+    print(f"Cascade:     {cascade_throughput:10.1f} rows/s ({cascade_throughput / full_throughput:.2f}x)")
+    print(f"Cleared by the pre-filter: {cleared.mean():.1%} of flows")
+    print(f"Agreement with the full model: {agreement:.2%}")
+    print(f"Attacks cleared as benign: {missed_attacks} of {sum(p != benign_label for p in full_predictions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Define the base directory of the backend (backend/) and make its modules importable
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# Benchmark runs must not count towards the live dashboard's feature statistics
+os.environ.setdefault('ATTACK_STATS_BACKEND', 'local')
+
+from models import nn_model
+
+# The scikit-learn model the benchmarks compare against
+model = nn_model.get_model()
+
+# Path to the replay dataset used by the live traffic simulation
+replay_data_path = os.path.join(BASE_DIR, 'network', 'test_data_with_network_info.csv')
+
+
+def load_sample_flows(n_rows, seed=0):
+    """
+    Load n_rows flows from the replay dataset.
+    Falls back to random flows around the scaler means when the dataset is not available.
+    """
+    if os.path.exists(replay_data_path):
+        traffic_data = pd.read_csv(replay_data_path)
+        traffic_data.columns = traffic_data.columns.str.strip()
+        return traffic_data.sample(n_rows, replace=len(traffic_data) < n_rows, random_state=seed).reset_index(drop=True)
+
+    print(f"Replay dataset not found at {replay_data_path}, using random flows")
+    rng = np.random.default_rng(seed)
+    scale = getattr(nn_model.scaler, 'scale_', np.ones(len(nn_model.model_columns)))
+    mean = getattr(nn_model.scaler, 'mean_', np.zeros(len(nn_model.model_columns)))
+    flows = pd.DataFrame(
+        np.abs(rng.normal(mean, scale, size=(n_rows, len(nn_model.model_columns)))),
+        columns=nn_model.model_columns
+    )
+    flows.insert(0, 'Source IP', '10.0.0.1')
+    flows.insert(1, 'Destination IP', '10.0.0.2')
+    flows.insert(2, 'Source Port', 50000)
+    flows.insert(3, 'Protocol', 'TCP')
+    return flows
+
+
+def scaled_features(flows):
+    """
+    Scale flows exactly like process_network_traffic does.
+    """
+    features = flows.reindex(columns=nn_model.model_columns, fill_value=0)
+    return nn_model.scaler.transform(features)
+
+
+def time_calls(function, arguments, repeats=1):
+    """
+    Call function once per argument and return the latencies in milliseconds.
+    """
+    latencies = []
+    for _ in range(repeats):
+        for argument in arguments:
+            start = time.perf_counter()
+            function(argument)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def print_latencies(label, latencies):
+    """
+    Print a one-line latency summary.
+    """
+    print(
+        f"{label:<40} n={len(latencies):<6} "
+        f"mean={latencies.mean():8.2f} ms  p50={np.percentile(latencies, 50):8.2f} ms  "
+        f"p95={np.percentile(latencies, 95):8.2f} ms"
+    )
@@ -0,0 +1,38 @@
+import argparse
+import shap
+
+from common import nn_model, model, load_sample_flows, scaled_features, time_calls, print_latencies
+
+
+def explain_with_new_explainer(instance):
+    """
+    Previous behaviour: build a TreeExplainer for every request.
+    """
+    explainer = shap.TreeExplainer(model)
+    return explainer.shap_values(instance)
+
+
+def explain_with_shared_explainer(instance):
+    """
+    Current behaviour: reuse the process-wide TreeExplainer.
+    """
+    return nn_model.get_explainer().shap_values(instance)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request SHAP explanation latency, before and after sharing the explainer.")
+    parser.add_argument('--requests', type=int, default=50, help="Number of single-flow requests to time")
+    args = parser.parse_args()
+
+    X = scaled_features(load_sample_flows(args.requests))
+    instances = [X[i:i + 1] for i in range(len(X))]
+
+    # Build the shared explainer up front so its one-off cost is not counted per request
+    nn_model.get_explainer()
+
+    print_latencies("new TreeExplainer per request", time_calls(explain_with_new_explainer, instances))
+    print_latencies("shared TreeExplainer", time_calls(explain_with_shared_explainer, instances))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import argparse
+
+from common import model, load_sample_flows, scaled_features, time_calls, print_latencies
+from models.forest_engine import CompiledForest, verify_against_sklearn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the compiled NumPy forest with scikit-learn's predict_proba.")
+    parser.add_argument('--rows', type=int, default=2000, help="Number of flows used for the bit-for-bit check")
+    parser.add_argument('--requests', type=int, default=200, help="Number of calls timed per batch size")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 64, 512])
+    args = parser.parse_args()
+
+    X = scaled_features(load_sample_flows(args.rows))
+    compiled_forest = CompiledForest.from_sklearn(model)
+
+    matches, max_difference = verify_against_sklearn(model, compiled_forest, X)
+    print(f"Bit-for-bit match on {len(X)} rows: {matches} (max abs difference {max_difference})")
+
+    for batch_size in args.batch_sizes:
+        batches = [X[(i * batch_size) % len(X):][:batch_size] for i in range(args.requests)]
+        print_latencies(f"sklearn predict_proba, batch={batch_size}", time_calls(model.predict_proba, batches))
+        print_latencies(f"numpy predict_proba, batch={batch_size}", time_calls(compiled_forest.predict_proba, batches))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import numpy as np
+
+from common import nn_model, model, load_sample_flows, scaled_features, time_calls, print_latencies
+
+
+def predict_stage_before(instance):
+    """
+    Previous behaviour: predict, predict_proba and a second predict_proba inside explain_with_shap.
+    """
+    model.predict(instance)
+    model.predict_proba(instance)
+    model.predict_proba(instance)
+
+
+def predict_stage_after(instance):
+    """
+    Current behaviour: a single predict_proba, with the class taken from its argmax.
+    """
+    probabilities = model.predict_proba(instance)
+    return model.classes_[np.argmax(probabilities, axis=1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage timing breakdown of process_network_traffic.")
+    parser.add_argument('--requests', type=int, default=50, help="Number of single-flow requests to time")
+    args = parser.parse_args()
+
+    flows = load_sample_flows(args.requests)
+    X = scaled_features(flows)
+    instances = [X[i:i + 1] for i in range(len(X))]
+
+    print_latencies("forest traversals before (3 passes)", time_calls(predict_stage_before, instances))
+    print_latencies("forest traversals after (1 pass)", time_calls(predict_stage_after, instances))
+
+    # Warm up the shared explainer, then time whole requests stage by stage
+    nn_model.get_explainer()
+    nn_model.reset_stage_timings()
+    for row_index in range(len(flows)):
+        nn_model.process_network_traffic(flows.iloc[row_index:row_index + 1])
+
+    print("\nprocess_network_traffic stages:")
+    for stage, timing in nn_model.get_stage_timings().items():
+        print(f"  {stage:<10} mean={timing['mean_ms_per_call']:8.3f} ms/call  total={timing['total_ms']:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
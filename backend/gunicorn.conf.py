@@ -0,0 +1,52 @@
+import gc
+import os
+
+# Gunicorn settings, used by the Dockerfile: gunicorn -c gunicorn.conf.py main:app
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+
+# Live traffic streams keep their connection open for as long as a dashboard is open. gevent
+# workers serve each connection from a greenlet, so open streams never take the threads regular
+# requests need: a worker holds up to worker_connections connections, streams included, and the
+# server about workers x worker_connections. With GUNICORN_WORKER_CLASS=gthread every stream
+# holds one of a worker's threads for as long as it is open, so the server only takes
+# workers x threads connections in total and requests wait once streams hold every thread.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+
+if worker_class == 'gevent':
+    # Patch before the app is preloaded, so the locks, queues and sleeps it creates cooperate with greenlets
+    from gevent import monkey
+    monkey.patch_all()
+
+# Load the app, model, scaler and replay dataset once in the master and fork the workers from it,
+# so their memory pages are shared copy-on-write instead of being loaded once per worker
+preload_app = os.getenv('PRELOAD_APP', '1') == '1'
+
+
+def when_ready(server):
+    """
+    Finish loading in the master, then freeze the loaded objects before the workers are forked.
+    """
+    if not preload_app:
+        return
+
+    from models.nn_model import warm_up
+    warm_up()
+
+    # Objects in the permanent generation are never scanned by the collector, so a worker's
+    # garbage collection does not write to (and un-share) the pages holding the model
+    gc.collect()
+    gc.freeze()
+    server.log.info("Model preloaded in the master process, garbage collector frozen")
+
+
+def post_fork(server, worker):
+    """
+    Give each worker its own database connections instead of the master's pooled ones.
+    """
+    if preload_app:
+        from database import engine
+        engine.dispose(close=False)
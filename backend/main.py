@@ -1,14 +1,27 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import os
+import json
+import queue
+import hmac
 import logging
 import bcrypt
 import jwt
 from database import SessionLocal, init_db
-from model import User, SavedAttack  
-from models.nn_model import process_network_traffic
+from model import User, SavedAttack, IngestedFlow
+from models.nn_model import (
+    process_network_traffic, get_stage_timings, get_explanation, explanation_cache, EXPLANATION_MODES,
+    record_attack_features, get_attack_feature_stats, get_attack_feature_stats_version, get_cascade_stats,
+    get_bundle, request_reload, check_reload_trigger, on_model_reload, start_model_watcher
+)
+from network.precompute import load_replay_scores, precompute_replay_scores, save_replay_scores
+from network.sampling import AliasSampler, build_row_index
+from network.replay_store import load_traffic_data
+from models.batching import MicroBatcher
+from streaming import TrafficBroadcaster, SharedEventLog
 import numpy as np
+from sqlalchemy import func
 from datetime import datetime, timedelta
 
 # Initialize Flask app and enable CORS
@@ -24,21 +37,105 @@ logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %
 # Path to the CSV file (located in the 'network' folder)
 csv_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'network', 'test_data_with_network_info.csv')
 
-# Load the CSV data once at the start
+# Load the dataset once at the start, from its memory-mapped columnar store when one exists
 try:
-    traffic_data = pd.read_csv(csv_file_path)
-    # Ensure that columns are correctly named (case-sensitive) and strip spaces
-    traffic_data.columns = traffic_data.columns.str.strip()
+    traffic_data = load_traffic_data(csv_file_path)
     logging.info(f"Successfully loaded dataset from {csv_file_path}")
 except Exception as e:
     logging.error(f"Failed to load CSV file: {e}")
     raise
 
+# Optionally serve /live-traffic from scores precomputed once for every row of the dataset
+PRECOMPUTED_REPLAY = os.getenv("PRECOMPUTED_REPLAY", "0") == "1"
+precomputed_scores = None
+if PRECOMPUTED_REPLAY:
+    precomputed_scores = load_replay_scores(csv_file_path, len(traffic_data))
+    if precomputed_scores is None:
+        logging.info("No precomputed scores found, scoring the replay dataset at startup")
+        precomputed_scores = precompute_replay_scores(traffic_data)
+        save_replay_scores(precomputed_scores, csv_file_path)
+    logging.info(f"Serving live traffic from {len(precomputed_scores)} precomputed scores")
+
+# Reload the model when its files change, if MODEL_WATCH_INTERVAL is set
+start_model_watcher()
+
+def refresh_precomputed_scores(bundle):
+    """
+    Drop precomputed scores of the replaced model after a reload. Scores precomputed for
+    the new model (python network/precompute.py) are picked up; otherwise rows are scored live.
+    """
+    global precomputed_scores
+    if not PRECOMPUTED_REPLAY:
+        return
+    precomputed_scores = load_replay_scores(csv_file_path, len(traffic_data), bundle.fingerprint())
+    if precomputed_scores is None:
+        logging.info("No precomputed scores for the reloaded model, scoring live traffic on demand")
+
+on_model_reload(refresh_precomputed_scores)
+
+# Pick up reloads requested through another worker process
+@app.before_request
+def pick_up_model_reload():
+    check_reload_trigger()
+
+# Optionally collect concurrent scoring requests into micro-batches for the model
+micro_batcher = None
+if os.getenv("MICRO_BATCHING", "0") == "1":
+    micro_batcher = MicroBatcher(
+        process_network_traffic,
+        max_wait_ms=float(os.getenv("MICRO_BATCH_WAIT_MS", 2)),
+        max_rows=int(os.getenv("MICRO_BATCH_MAX_ROWS", 64))
+    )
+
+def score_flows(flows_df, explanation_mode=None):
+    """
+    Score a DataFrame of flows, through the micro-batcher when it is enabled.
+    Returns the processed DataFrame, or None if scoring failed.
+    """
+    if micro_batcher is None:
+        return process_network_traffic(flows_df, explanation_mode=explanation_mode)
+    try:
+        return micro_batcher.score(flows_df, explanation_mode)
+    except Exception:
+        return None
+
+def get_precomputed_traffic(row_label):
+    """
+    Build the live traffic response for a dataset row from its precomputed score.
+    The aggregate feature statistics are updated as if the row had just been scored.
+    """
+    record = dict(precomputed_scores[traffic_data.index.get_loc(row_label)])
+    record_attack_features(record['prediction'], record['feature_importance'])
+    return record
+
 # Add these variables at the top with other globals
 ATTACK_PROBABILITY = 0.15  # 15% chance of attack
 LAST_ATTACK_TIME = None
 MIN_TIME_BETWEEN_ATTACKS = timedelta(seconds=30)  # Minimum 30 seconds between attacks
 
+# Different probabilities for different attack types
+attack_probabilities = {
+    'Bot': 0.15,
+    'Brute Force': 0.20,
+    'DDoS': 0.15,
+    'DoS': 0.20,
+    'Port Scan': 0.20,
+    'Web Attack': 0.10
+}
+
+# Row positions of every attack type and an O(1) sampler over the attack types, built once at load
+attack_type_rows = build_row_index(traffic_data, 'Attack Type')
+attack_type_sampler = AliasSampler(attack_probabilities.keys(), attack_probabilities.values())
+
+def sample_traffic_row(attack_type):
+    """
+    Fetch a random row of the given attack type by position, or None if there is none.
+    """
+    rows = attack_type_rows.get(attack_type)
+    if rows is None or len(rows) == 0:
+        return None
+    return traffic_data.iloc[rows[np.random.randint(len(rows))]]
+
 def get_random_traffic():
     """
     Get traffic data with realistic distribution:
@@ -53,65 +150,315 @@ def get_random_traffic():
         # Check if we're still in cooldown period after last attack
         if LAST_ATTACK_TIME and (current_time - LAST_ATTACK_TIME) < MIN_TIME_BETWEEN_ATTACKS:
             # Get only benign traffic during cooldown
-            benign_traffic = traffic_data[traffic_data['Attack Type'] == 'BENIGN']
-            return benign_traffic.sample(1).iloc[0]
+            return sample_traffic_row('BENIGN')
 
         # Determine if this should be an attack or benign traffic
         is_attack = np.random.random() < ATTACK_PROBABILITY
 
         if is_attack:
-            # Different probabilities for different attack types
-            attack_probabilities = {
-                'Bot': 0.15,
-                'Brute Force': 0.20,
-                'DDoS': 0.15,
-                'DoS': 0.20,
-                'Port Scan': 0.20,
-                'Web Attack': 0.10
-            }
-            
             # Select attack type based on probabilities
-            attack_type = np.random.choice(
-                list(attack_probabilities.keys()),
-                p=list(attack_probabilities.values())
-            )
+            attack_type = attack_type_sampler.sample()
             
             # Get traffic data for selected attack type
-            attack_traffic = traffic_data[traffic_data['Attack Type'] == attack_type]
-            if len(attack_traffic) > 0:
+            attack_traffic = sample_traffic_row(attack_type)
+            if attack_traffic is not None:
                 LAST_ATTACK_TIME = current_time
-                return attack_traffic.sample(1).iloc[0]
+                return attack_traffic
         
         # Default to benign traffic
-        benign_traffic = traffic_data[traffic_data['Attack Type'] == 'BENIGN']
-        return benign_traffic.sample(1).iloc[0]
+        return sample_traffic_row('BENIGN')
 
     except Exception as e:
         logging.error(f"Error selecting random traffic data: {e}")
         raise
 
-@app.route("/live-traffic", methods=["GET"])
-def live_traffic():
+def generate_live_traffic(explanation_mode=None):
+    """
+    Sample one flow from the dataset and score it, returning the response record.
+    """
+    # Simulate traffic by randomly selecting a value from the dataset
+    random_traffic = get_random_traffic()
+
+    # Look the row up when the dataset has been precomputed and no explanation mode was requested
+    if precomputed_scores is not None and not explanation_mode:
+        return get_precomputed_traffic(random_traffic.name)
+
+    # Convert all values to native Python types (int, float, str)
+    simulated_data = {col: random_traffic[col] for col in random_traffic.index}
+    
+    simulated_df = pd.DataFrame([simulated_data])
+    logging.debug(f"Simulated Traffic Data: {simulated_df.to_dict(orient='records')}")
+
+    # Process the simulated traffic data using the AI model
+    processed_traffic = score_flows(simulated_df, explanation_mode)
+
+    # Return the processed network traffic with attack type and recommendation
+    return processed_traffic.to_dict(orient="records")[0]
+
+# Stream sampled dataset rows ('replay') or the flows scored by network/ingest.py ('ingest')
+LIVE_TRAFFIC_SOURCE = os.getenv("LIVE_TRAFFIC_SOURCE", "replay")
+# At most one stream queue's worth of ingested flows per tick
+INGEST_STREAM_MAX_EVENTS = int(os.getenv("INGEST_STREAM_MAX_EVENTS", 20))
+last_streamed_flow_id = None
+
+def get_new_ingested_flows():
+    """
+    Fetch the newest flows ingested since the previous call, oldest first and at most
+    INGEST_STREAM_MAX_EVENTS of them. When more arrived, the older ones are skipped so the
+    stream stays current instead of falling behind; /api/ingest/flows has every flow.
+    The first call starts from the newest flow.
+    """
+    global last_streamed_flow_id
+    db = SessionLocal()
     try:
-        # Simulate traffic by randomly selecting a value from the dataset
-        random_traffic = get_random_traffic()
+        if last_streamed_flow_id is None:
+            last_streamed_flow_id = db.query(func.max(IngestedFlow.id)).scalar() or 0
+            return []
+        flows = (
+            db.query(IngestedFlow)
+            .filter(IngestedFlow.id > last_streamed_flow_id)
+            .order_by(IngestedFlow.id.desc())
+            .limit(INGEST_STREAM_MAX_EVENTS)
+            .all()
+        )
+        if flows:
+            last_streamed_flow_id = flows[0].id
+        return [flow.to_dict() for flow in reversed(flows)]
+    finally:
+        db.close()
 
-        # Convert all values to native Python types (int, float, str)
-        simulated_data = {col: random_traffic[col] for col in random_traffic.index}
-        
-        simulated_df = pd.DataFrame([simulated_data])
-        logging.debug(f"Simulated Traffic Data: {simulated_df.to_dict(orient='records')}")
+# Attack feature statistics as last sent on the live traffic stream
+last_streamed_stats = {}
 
-        # Process the simulated traffic data using the AI model
-        processed_traffic = process_network_traffic(simulated_df)
+def generate_stream_events():
+    """
+    Produce the events of one live traffic stream tick: the scored flows, then the
+    attack feature statistics that changed since the previous tick.
+    """
+    global last_streamed_stats
+    if LIVE_TRAFFIC_SOURCE == "ingest":
+        for flow in get_new_ingested_flows():
+            yield 'traffic', flow
+    else:
+        yield 'traffic', generate_live_traffic()
+
+    stats = get_attack_feature_stats()
+    changed_stats = {}
+    for attack_type, features in stats.items():
+        previous = last_streamed_stats.get(attack_type, {})
+        changed = {feature: count for feature, count in features.items() if previous.get(feature) != count}
+        if changed:
+            changed_stats[attack_type] = changed
+    if changed_stats:
+        last_streamed_stats = stats
+        yield 'stats', {'version': get_attack_feature_stats_version(), 'changes': changed_stats}
+
+# Backend of the live traffic stream: 'shared' (one scoring loop for every worker process
+# on the host, its events passed on through shared memory) or 'local' (a loop per process)
+STREAM_BACKEND = os.getenv("STREAM_BACKEND", "shared")
+
+def create_stream_event_log():
+    """
+    Create the event log shared by the workers' stream broadcasters, or None for per-process loops.
+    """
+    if STREAM_BACKEND == "shared":
+        try:
+            return SharedEventLog(os.getenv("STREAM_SEGMENT", "projectv2_stream"))
+        except Exception as e:
+            logging.warning(f"Shared live traffic stream unavailable ({e}), using a scoring loop per process")
+    return None
+
+# One scoring loop feeds every connected dashboard
+traffic_broadcaster = TrafficBroadcaster(
+    generate_stream_events,
+    interval_seconds=float(os.getenv("STREAM_INTERVAL_SECONDS", 5)),
+    queue_size=int(os.getenv("STREAM_QUEUE_SIZE", 20)),
+    event_log=create_stream_event_log()
+)
 
-        # Return the processed network traffic with attack type and recommendation
-        return jsonify(processed_traffic.to_dict(orient="records")[0])
+@app.route("/live-traffic", methods=["GET"])
+def live_traffic():
+    try:
+        # Optional per-request explanation mode (shap, fast or none)
+        explanation_mode = request.args.get("explain")
+        if explanation_mode and explanation_mode not in EXPLANATION_MODES:
+            return jsonify({"error": f"explain must be one of {', '.join(EXPLANATION_MODES)}"}), 400
+
+        return jsonify(generate_live_traffic(explanation_mode))
 
     except Exception as e:
         logging.error(f"Error in live_traffic route: {e}")
         return jsonify({"error": str(e)}), 500
 
+# Server-Sent Events stream of live traffic shared by all clients
+@app.route("/live-traffic/stream", methods=["GET"])
+def live_traffic_stream():
+    subscriber = traffic_broadcaster.subscribe()
+
+    def events():
+        try:
+            while True:
+                try:
+                    event = subscriber.get(timeout=15)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+        finally:
+            traffic_broadcaster.unsubscribe(subscriber)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Aggregate attack feature statistics, served separately from the per-flow responses
+stats_response_cache = {"etag": None, "body": None}
+
+@app.route("/api/attack-feature-stats", methods=["GET"])
+def attack_feature_stats():
+    # The ETag only changes when the statistics do, so unchanged polls get an empty 304.
+    # The version is shared by every worker, so any worker can answer a revalidation.
+    etag = get_attack_feature_stats_version()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        # Serialize each version of the statistics only once
+        if stats_response_cache["etag"] != etag:
+            stats_response_cache["body"] = json.dumps({"version": etag, "stats": get_attack_feature_stats()})
+            stats_response_cache["etag"] = etag
+        response = Response(stats_response_cache["body"], mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+# Micro-batching counters
+@app.route("/api/metrics/batching", methods=["GET"])
+def batching_stats():
+    if micro_batcher is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **micro_batcher.stats()}), 200
+
+# Live traffic stream clients and event counters
+@app.route("/api/metrics/stream", methods=["GET"])
+def stream_stats():
+    return jsonify(traffic_broadcaster.stats()), 200
+
+# Batch Scoring Route
+@app.route("/api/score/batch", methods=["POST"])
+def score_batch():
+    try:
+        # Accept either a list of flows or an object with a "flows" list
+        data = request.get_json()
+        flows = data.get("flows") if isinstance(data, dict) else data
+        if not isinstance(flows, list) or len(flows) == 0:
+            return jsonify({"message": "Request body must contain a non-empty list of flows"}), 400
+
+        # Optional explanation mode, from the body or the query string
+        explanation_mode = (data.get("explain") if isinstance(data, dict) else None) or request.args.get("explain")
+        if explanation_mode and explanation_mode not in EXPLANATION_MODES:
+            return jsonify({"message": f"explain must be one of {', '.join(EXPLANATION_MODES)}"}), 400
+
+        flows_df = pd.DataFrame(flows)
+
+        # The display columns are required to build the result records
+        required_columns = ['Source IP', 'Destination IP', 'Source Port', 'Protocol']
+        missing_columns = [col for col in required_columns if col not in flows_df.columns]
+        if missing_columns:
+            return jsonify({"message": "Missing required flow fields", "missing": missing_columns}), 400
+
+        # Score every flow in a single pass through the model
+        processed_traffic = score_flows(flows_df, explanation_mode)
+        if processed_traffic is None:
+            return jsonify({"message": "Error scoring flows"}), 500
+
+        results = processed_traffic.to_dict(orient="records")
+        return jsonify({"count": len(results), "results": results}), 200
+
+    except Exception as e:
+        logging.error(f"Error in score_batch route: {e}")
+        return jsonify({"message": "Error scoring flows", "error": str(e)}), 500
+
+# Flows scored from CICFlowMeter exports by network/ingest.py, newest first or after a given id
+@app.route("/api/ingest/flows", methods=["GET"])
+def ingested_flows():
+    db = SessionLocal()
+    try:
+        limit = min(int(request.args.get("limit", 100)), 1000)
+        after_id = request.args.get("after", type=int)
+        query = db.query(IngestedFlow)
+        if after_id is not None:
+            flows = query.filter(IngestedFlow.id > after_id).order_by(IngestedFlow.id).limit(limit).all()
+        else:
+            flows = query.order_by(IngestedFlow.id.desc()).limit(limit).all()
+        return jsonify([dict(flow.to_dict(), id=flow.id) for flow in flows]), 200
+
+    except Exception as e:
+        logging.error(f"Error in ingested_flows route: {e}")
+        return jsonify({"message": "Error retrieving ingested flows", "error": str(e)}), 500
+    finally:
+        db.close()
+
+# On-demand explanation for a flow scored in deferred mode
+@app.route("/api/explanations/<explanation_id>", methods=["GET"])
+def explanation(explanation_id):
+    try:
+        explanation_mode = request.args.get("mode", "shap")
+        if explanation_mode not in ("shap", "fast"):
+            return jsonify({"message": "mode must be one of shap, fast"}), 400
+
+        result = get_explanation(explanation_id, explanation_mode)
+        if result is None:
+            return jsonify({"message": "Explanation not found or expired"}), 404
+
+        return jsonify(result), 200
+
+    except Exception as e:
+        logging.error(f"Error in explanation route: {e}")
+        return jsonify({"message": "Error generating explanation", "error": str(e)}), 500
+
+# Per-stage timing breakdown of the scoring pipeline
+@app.route("/api/metrics/stage-timings", methods=["GET"])
+def stage_timings():
+    return jsonify(get_stage_timings()), 200
+
+# Explanation cache size and hit/miss counters
+@app.route("/api/metrics/explanation-cache", methods=["GET"])
+def explanation_cache_stats():
+    return jsonify(explanation_cache.stats()), 200
+
+# Model administration, enabled by setting ADMIN_TOKEN and sent as the X-Admin-Token header
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def is_admin_request():
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+@app.route("/api/admin/model", methods=["GET"])
+def model_status():
+    if not is_admin_request():
+        return jsonify({"message": "Forbidden"}), 403
+    return jsonify(get_bundle().status()), 200
+
+# Load the model files again and swap them in without restarting. The worker that handles the
+# request reloads before answering; the others reload on their next request, through the trigger file.
+@app.route("/api/admin/reload-model", methods=["POST"])
+def reload_model():
+    if not is_admin_request():
+        return jsonify({"message": "Forbidden"}), 403
+    try:
+        return jsonify({"message": "Model reloaded", "model": request_reload()}), 200
+    except Exception as e:
+        logging.error(f"Error reloading model: {e}")
+        return jsonify({"message": "Error reloading model, the current model is still in use", "error": str(e)}), 500
+
+# Benign pre-filter counters
+@app.route("/api/metrics/cascade", methods=["GET"])
+def cascade_stats():
+    return jsonify(get_cascade_stats()), 200
+
 # Sign-Up Route
 @app.route("/sign-up", methods=["POST"])
 def sign_up():
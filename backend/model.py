@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from database import Base, engine  # Import Base and engine from database.py
 from datetime import datetime
@@ -68,6 +68,61 @@ class SavedAttack(Base):
             'flowDuration': self.flow_duration
         }
 
+# Define the IngestedFlow model for flows scored from CICFlowMeter exports by network/ingest.py
+class IngestedFlow(Base):
+    __tablename__ = 'ingested_flows'
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_file = Column(String, index=True)
+    flow_id = Column(String)
+    timestamp = Column(String)
+    ingested_at = Column(DateTime, default=datetime.utcnow)
+    attack_type = Column(String, index=True)
+    confidence = Column(Float)
+    recommendation = Column(String)
+    interpretation = Column(String)
+    feature_importance = Column(JSON)
+    traffic_stats = Column(JSON)
+    source_ip = Column(String)
+    destination_ip = Column(String)
+    protocol = Column(String)
+    source_port = Column(Integer)
+
+    def __repr__(self):
+        return f"<IngestedFlow(type={self.attack_type}, source_file={self.source_file})>"
+
+    def to_dict(self):
+        # Same keys as the records returned by process_network_traffic
+        return {
+            'Source IP': self.source_ip,
+            'Destination IP': self.destination_ip,
+            'Source Port': self.source_port,
+            'Protocol': self.protocol,
+            'prediction': self.attack_type,
+            'confidence_score': self.confidence,
+            'recommendation': self.recommendation,
+            'interpretation': self.interpretation,
+            'feature_importance': self.feature_importance,
+            'traffic_stats': self.traffic_stats,
+            'flow_id': self.flow_id,
+            'timestamp': self.timestamp,
+            'source_file': self.source_file
+        }
+
+# Define the IngestCheckpoint model holding how far each flow file has been ingested
+class IngestCheckpoint(Base):
+    __tablename__ = 'ingest_checkpoints'
+
+    path = Column(String, primary_key=True)
+    inode = Column(BigInteger)
+    offset = Column(BigInteger, default=0)
+    header = Column(String)
+    rows = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<IngestCheckpoint(path={self.path}, offset={self.offset})>"
+
 #Base.metadata.drop_all(engine)  # Drops all tables
 #Base.metadata.create_all(engine)  # Creates all tables with new schema
 
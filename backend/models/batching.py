@@ -0,0 +1,141 @@
+import logging
+import os
+import queue
+import threading
+import time
+import pandas as pd
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Collect concurrent scoring requests into one batch for the model.
+
+    Callers submit a DataFrame of flows and get a Future. A scheduler thread waits for the
+    first request, keeps collecting until max_wait_ms has passed or max_rows rows are queued,
+    then runs each explanation mode's requests through process in a single call and hands
+    every caller its own slice of the result, in the order its rows were submitted.
+    """
+
+    def __init__(self, process, max_wait_ms=2.0, max_rows=64):
+        self.process = process
+        self.max_wait_seconds = max_wait_ms / 1000.0
+        self.max_rows = max_rows
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._process_id = None
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.wait_ms = 0.0
+
+    def submit(self, df, explanation_mode=None):
+        """
+        Queue a DataFrame of flows for scoring and return a Future of its processed DataFrame.
+        """
+        future = Future()
+        self._ensure_running()
+        self._requests.put((df, explanation_mode, future, time.perf_counter()))
+        return future
+
+    def score(self, df, explanation_mode=None, timeout=None):
+        """
+        Score a DataFrame of flows through the next batch and wait for the result.
+        """
+        return self.submit(df, explanation_mode).result(timeout=timeout)
+
+    def stats(self):
+        """
+        Get the batch counters and average batch size.
+        """
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'requests': self.requests,
+                'rows': self.rows,
+                'mean_requests_per_batch': round(self.requests / self.batches, 2) if self.batches else 0.0,
+                'mean_rows_per_batch': round(self.rows / self.batches, 2) if self.batches else 0.0,
+                'mean_queue_wait_ms': round(self.wait_ms / self.requests, 3) if self.requests else 0.0,
+                'max_wait_ms': self.max_wait_seconds * 1000.0,
+                'max_rows': self.max_rows
+            }
+
+    def _ensure_running(self):
+        """
+        Start the scheduler thread on first use, and again in a forked worker process.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._process_id != os.getpid():
+                if self._process_id != os.getpid():
+                    # Requests queued in the parent process can never be served here
+                    self._requests = queue.Queue()
+                self._process_id = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """
+        Block for the first request, then gather more until the window closes or the batch is full.
+        """
+        batch = [self._requests.get()]
+        rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait_seconds
+        while rows < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            rows += len(request[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+
+            # Requests with different explanation modes cannot share a call
+            by_mode = {}
+            for request in batch:
+                by_mode.setdefault(request[1], []).append(request)
+            for explanation_mode, requests in by_mode.items():
+                self._process_group(requests, explanation_mode)
+
+            with self._lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.rows += sum(len(request[0]) for request in batch)
+                self.wait_ms += sum((started - request[3]) * 1000 for request in batch)
+
+    def _process_group(self, requests, explanation_mode):
+        """
+        Score the requests of one explanation mode together and complete their futures.
+        """
+        try:
+            frames = [request[0] for request in requests]
+            if len(frames) == 1:
+                combined = frames[0]
+            else:
+                # Fill the columns a request lacks with 0, as process fills missing model
+                # columns for a request scored alone; concat alone would leave NaN
+                columns = list(dict.fromkeys(column for frame in frames for column in frame.columns))
+                combined = pd.concat(
+                    [frame.reindex(columns=columns, fill_value=0) for frame in frames], ignore_index=True
+                )
+            processed = self.process(combined, explanation_mode=explanation_mode)
+            if processed is None:
+                raise RuntimeError("Error scoring flows")
+
+            start = 0
+            for df, _, future, _ in requests:
+                future.set_result(processed.iloc[start:start + len(df)].reset_index(drop=True))
+                start += len(df)
+        except Exception as e:
+            logging.error(f"Error scoring micro-batch: {e}")
+            for _, _, future, _ in requests:
+                if not future.done():
+                    future.set_exception(e)
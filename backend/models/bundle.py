@@ -0,0 +1,214 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+import joblib
+import numpy as np
+import shap
+from .forest_engine import CompiledForest, file_digest, forest_path_for, verify_against_sklearn
+from .cascade import CascadeFilter
+
+
+class ModelBundle:
+    """
+    One loaded set of model artifacts: the forest, scaler and label encoder, plus the
+    explainer, compiled forest and pre-filter derived from them.
+
+    A request takes the current bundle once and uses it throughout, so swapping in a
+    new bundle never mixes two models within one request. The heavy parts are built
+    on first use, each under its own lock.
+    """
+
+    def __init__(self, model_path, scaler_path, label_encoder_path, forest_path, cascade_path, trigger_path=None):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.label_encoder_path = label_encoder_path
+        self.forest_path = forest_path
+        self.cascade_path = cascade_path
+        self.trigger_path = trigger_path
+        self.version = uuid.uuid4().hex[:8]
+        self.loaded_at = time.time()
+        self.source_mtimes = artifact_mtimes(self.artifact_paths())
+
+        # Load the scaler used during training and the LabelEncoder for 'Attack Type'
+        self.scaler = joblib.load(scaler_path)
+        self.le = joblib.load(label_encoder_path)
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._explainer = None
+        self._explainer_lock = threading.Lock()
+        self._compiled_forest = None
+        self._compiled_forest_lock = threading.Lock()
+        self.forest_variant = None
+        self._cascade = None
+        self._cascade_lock = threading.Lock()
+        self._fingerprint = None
+        self._digests = {}
+
+    def artifact_paths(self):
+        """
+        Files whose change means the bundle should be reloaded, including the reload
+        trigger file touched to ask every process for a reload.
+        """
+        paths = [
+            self.model_path, self.scaler_path, self.label_encoder_path,
+            os.path.join(self.forest_path, 'manifest.json'), self.cascade_path
+        ]
+        return paths + [self.trigger_path] if self.trigger_path else paths
+
+    def fingerprint(self):
+        """
+        Digest of the model, scaler, label encoder, compiled forest manifest and pre-filter files
+        this bundle was loaded from. Results stored alongside it are only valid for the same fingerprint.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            forest_manifest_path = os.path.join(self.forest_path, 'manifest.json')
+            for path in (self.model_path, self.scaler_path, self.label_encoder_path, forest_manifest_path, self.cascade_path):
+                digest.update(f"{os.path.basename(path)}:{self.file_digest(path)};".encode())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def file_digest(self, path):
+        """
+        SHA-1 of one of the bundle's files, read once per bundle and reused.
+        """
+        if path not in self._digests:
+            self._digests[path] = file_digest(path)
+        return self._digests[path]
+
+    def model(self):
+        """
+        Return the trained scikit-learn model, unpickling it on first use.
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = joblib.load(self.model_path)
+        return self._model
+
+    def explainer(self):
+        """
+        Return the SHAP TreeExplainer for the model.
+        Building the explainer walks every tree of the forest, so it is only done once.
+        """
+        if self._explainer is None:
+            with self._explainer_lock:
+                if self._explainer is None:
+                    self._explainer = shap.TreeExplainer(self.model())
+        return self._explainer
+
+    def load_compiled_forest_artifact(self):
+        """
+        Load the exported compiled forest with its node arrays memory mapped.
+        Returns None if there is no artifact or it was exported from a different model file,
+        judged by the SHA-1 of the model file recorded in the manifest.
+        A variant (a smaller forest derived from the model) is only loaded from a forest path
+        other than the model's own, i.e. when it was chosen explicitly, and only if it predicts
+        the model's classes in the model's order, so class indices mean the same for both.
+        """
+        if not os.path.exists(os.path.join(self.forest_path, 'manifest.json')):
+            return None
+        try:
+            compiled_forest, manifest = CompiledForest.load(self.forest_path)
+        except Exception as e:
+            print(f"Failed to load compiled forest from {self.forest_path}: {e}")
+            return None
+        if os.path.exists(self.model_path) and manifest.get('source_sha1') != self.file_digest(self.model_path):
+            print(f"Compiled forest at {self.forest_path} does not match {self.model_path}, ignoring it")
+            return None
+        if manifest.get('variant') and self.forest_path == forest_path_for(self.model_path):
+            print(f"Compiled forest at {self.forest_path} is the variant {manifest['variant']}, not {self.model_path}; "
+                  f"ignoring it, point FOREST_ARTIFACT at it to serve it")
+            return None
+        if manifest.get('variant') and list(compiled_forest.classes_) != list(self.model().classes_):
+            print(f"Compiled forest variant {manifest['variant']} at {self.forest_path} predicts "
+                  f"{[str(label) for label in compiled_forest.classes_]}, not the model's classes "
+                  f"{[str(label) for label in self.model().classes_]}; ignoring it")
+            return None
+        self.forest_variant = manifest.get('variant')
+        return compiled_forest
+
+    def compiled_forest(self):
+        """
+        Return the forest flattened into NumPy node arrays.
+        The exported artifact is used when there is one (it was verified when exported, or
+        is a variant chosen with FOREST_ARTIFACT);
+        otherwise the forest is compiled from the model and checked against scikit-learn on
+        a random batch. None is returned if the probabilities do not match exactly.
+        """
+        if self._compiled_forest is None:
+            with self._compiled_forest_lock:
+                if self._compiled_forest is None:
+                    compiled_forest = self.load_compiled_forest_artifact()
+                    if compiled_forest is None:
+                        model = self.model()
+                        compiled_forest = CompiledForest.from_sklearn(model)
+                        check_data = np.random.default_rng(0).normal(size=(256, model.n_features_in_))
+                        matches, max_difference = verify_against_sklearn(model, compiled_forest, check_data)
+                        if not matches:
+                            print(f"Compiled forest does not match scikit-learn (max difference {max_difference}), using sklearn engine")
+                            compiled_forest = False
+                    self._compiled_forest = compiled_forest
+        return self._compiled_forest or None
+
+    def cascade(self):
+        """
+        Return the benign pre-filter trained by models/cascade.py, loaded on first use.
+        None is returned if it has not been trained.
+        """
+        if self._cascade is None:
+            with self._cascade_lock:
+                if self._cascade is None:
+                    if os.path.exists(self.cascade_path):
+                        self._cascade = CascadeFilter.load(self.cascade_path)
+                    else:
+                        print(f"No pre-filter found at {self.cascade_path}, scoring every flow with the full model")
+                        self._cascade = False
+        return self._cascade or None
+
+    def predict_proba(self, X, engine):
+        """
+        Predict class probabilities with the given inference engine.
+        Falls back to scikit-learn when the compiled forest is unavailable.
+        """
+        if engine == 'numpy':
+            compiled_forest = self.compiled_forest()
+            if compiled_forest is not None:
+                return compiled_forest.predict_proba(X)
+        return self.model().predict_proba(X)
+
+    def classes(self, engine):
+        """
+        Class labels in the column order of predict_proba.
+        """
+        if engine == 'numpy':
+            compiled_forest = self.compiled_forest()
+            if compiled_forest is not None:
+                return compiled_forest.classes_
+        return self.model().classes_
+
+    def status(self):
+        """
+        Version, file fingerprint, load time and which lazily built parts are loaded.
+        The version is per process; the fingerprint is the same in every process serving the same files.
+        """
+        return {
+            'version': self.version,
+            'fingerprint': self.fingerprint(),
+            'loaded_at': self.loaded_at,
+            'model_loaded': self._model is not None,
+            'explainer_loaded': self._explainer is not None,
+            'compiled_forest_loaded': bool(self._compiled_forest),
+            'forest_variant': self.forest_variant,
+            'cascade_loaded': bool(self._cascade)
+        }
+
+
+def artifact_mtimes(paths):
+    """
+    Modification times of the given files, None for missing ones.
+    """
+    return {path: os.path.getmtime(path) if os.path.exists(path) else None for path in paths}
@@ -0,0 +1,139 @@
+import argparse
+import os
+import sys
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+# Define the base directory of the backend (backend/) so the tool can import the scoring code
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from .forest_engine import CompiledForest
+except ImportError:  # Run as a script
+    sys.path.insert(0, BASE_DIR)
+    from models.forest_engine import CompiledForest
+
+# Default location of the trained pre-filter
+cascade_path = os.path.join(BASE_DIR, 'models', 'cascade_model.pkl')
+
+
+class CascadeFilter:
+    """
+    Small, shallow forest that clears obviously benign flows before the full model.
+
+    It is trained on the full model's own benign/attack decisions, and its threshold on the
+    benign probability is calibrated so that only a bounded share of the flows the full model
+    flags as attacks would be cleared. Flows below the threshold go on to the full forest.
+    """
+
+    def __init__(self, forest, threshold, benign_label='BENIGN', report=None):
+        self.forest = forest
+        self.threshold = threshold
+        self.benign_label = benign_label
+        self.report = report or {}
+        self.compiled_forest = CompiledForest.from_sklearn(forest)
+        self.benign_index = list(forest.classes_).index(True)
+
+    def clear(self, X):
+        """
+        Return a mask of the rows confidently benign and every row's benign probability.
+        """
+        benign_probability = self.compiled_forest.predict_proba(X)[:, self.benign_index]
+        return benign_probability >= self.threshold, benign_probability
+
+    def save(self, path):
+        joblib.dump({
+            'forest': self.forest,
+            'threshold': self.threshold,
+            'benign_label': self.benign_label,
+            'report': self.report
+        }, path)
+
+    @classmethod
+    def load(cls, path):
+        saved = joblib.load(path)
+        return cls(saved['forest'], saved['threshold'], saved['benign_label'], saved['report'])
+
+
+def calibrate_threshold(benign_probability, full_is_benign, max_missed_rate):
+    """
+    Lowest benign probability threshold that clears at most max_missed_rate of the
+    flows the full model considers attacks. Never below 0.5.
+    """
+    attack_probabilities = np.sort(benign_probability[~full_is_benign])[::-1]
+    allowed_misses = int(max_missed_rate * len(attack_probabilities))
+    if allowed_misses >= len(attack_probabilities):
+        return 0.5
+    # Just above the probability of the first attack that may not be cleared
+    return max(0.5, float(np.nextafter(attack_probabilities[allowed_misses], np.inf)))
+
+
+def train_cascade(X, full_predictions, benign_label='BENIGN', n_trees=8, max_depth=6,
+                  max_missed_rate=0.001, seed=0):
+    """
+    Train the pre-filter on scaled features and the full model's predictions for them.
+    70% of the rows train the forest, the other 30% calibrate its threshold.
+    """
+    full_is_benign = np.asarray(full_predictions) == benign_label
+    order = np.random.default_rng(seed).permutation(len(X))
+    split = int(len(X) * 0.7)
+    train_rows, holdout_rows = order[:split], order[split:]
+
+    forest = RandomForestClassifier(n_estimators=n_trees, max_depth=max_depth, n_jobs=-1, random_state=seed)
+    forest.fit(X[train_rows], full_is_benign[train_rows])
+
+    compiled_forest = CompiledForest.from_sklearn(forest)
+    benign_probability = compiled_forest.predict_proba(X[holdout_rows])[:, list(forest.classes_).index(True)]
+    threshold = calibrate_threshold(benign_probability, full_is_benign[holdout_rows], max_missed_rate)
+
+    cleared = benign_probability >= threshold
+    holdout_attacks = ~full_is_benign[holdout_rows]
+    report = {
+        'holdout_rows': int(len(holdout_rows)),
+        'cleared_rate': float(cleared.mean()),
+        'benign_cleared_rate': float(cleared[~holdout_attacks].mean()) if (~holdout_attacks).any() else 0.0,
+        'missed_attacks': int((cleared & holdout_attacks).sum()),
+        'holdout_attacks': int(holdout_attacks.sum())
+    }
+    return CascadeFilter(forest, threshold, benign_label, report)
+
+
+def main():
+    from models import nn_model
+    from network.precompute import replay_data_path
+    from network.replay_store import load_traffic_data
+
+    parser = argparse.ArgumentParser(description="Train the benign pre-filter used by CASCADE=1.")
+    parser.add_argument('--data', default=replay_data_path, help="Replay dataset to train on")
+    parser.add_argument('--rows', type=int, default=200000, help="Maximum number of rows to use")
+    parser.add_argument('--trees', type=int, default=8, help="Number of trees in the pre-filter")
+    parser.add_argument('--depth', type=int, default=6, help="Maximum depth of the pre-filter's trees")
+    parser.add_argument('--max-missed-rate', type=float, default=0.001,
+                        help="Largest share of the full model's attacks the pre-filter may clear")
+    parser.add_argument('--output', default=cascade_path, help="Where to save the pre-filter")
+    args = parser.parse_args()
+
+    traffic_data = load_traffic_data(args.data)
+    if len(traffic_data) > args.rows:
+        traffic_data = traffic_data.sample(args.rows, random_state=0)
+
+    # Scale exactly like process_network_traffic and label with the full model's decisions
+    features = traffic_data.reindex(columns=nn_model.model_columns, fill_value=0)
+    X = nn_model.scaler.transform(features)
+    full_predictions = nn_model.get_classes()[np.argmax(nn_model.predict_proba(X), axis=1)]
+
+    cascade = train_cascade(X, full_predictions, n_trees=args.trees, max_depth=args.depth,
+                            max_missed_rate=args.max_missed_rate)
+    cascade.save(args.output)
+
+    report = cascade.report
+    print(f"Benign threshold: {cascade.threshold:.4f}")
+    print(f"Hold-out: {report['cleared_rate']:.1%} of flows cleared "
+          f"({report['benign_cleared_rate']:.1%} of benign flows), "
+          f"{report['missed_attacks']} of {report['holdout_attacks']} attacks cleared by mistake")
+    print(f"Pre-filter saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
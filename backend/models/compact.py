@@ -0,0 +1,168 @@
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score
+
+# Define the base directory of the backend (backend/) and make its modules importable
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from models.forest_engine import CompiledForest
+
+# Where variants are written with --save
+variants_path = os.path.join(BASE_DIR, 'models', 'variants')
+
+
+def subset_forest(forest, n_trees):
+    """
+    Keep only the first n_trees trees of a fitted forest.
+    """
+    subset = copy.copy(forest)
+    subset.estimators_ = forest.estimators_[:n_trees]
+    subset.n_estimators = len(subset.estimators_)
+    return subset
+
+
+def distill_forest(X, teacher_predictions, n_trees, max_depth, seed=0):
+    """
+    Train a smaller forest to reproduce the full model's predictions.
+    Its classes are only those the full model predicted on X, possibly fewer than the model's.
+    """
+    student = RandomForestClassifier(n_estimators=n_trees, max_depth=max_depth, n_jobs=-1, random_state=seed)
+    return student.fit(X, teacher_predictions)
+
+
+def measure_latency(compiled_forest, X, repeats=200, batch_size=256):
+    """
+    Mean milliseconds per single-flow call and rows/s at batch_size, with the compiled engine.
+    """
+    single_rows = [X[i % len(X):][:1] for i in range(repeats)]
+    start = time.perf_counter()
+    for row in single_rows:
+        compiled_forest.predict_proba(row)
+    single_ms = (time.perf_counter() - start) * 1000 / repeats
+
+    batch = X[:batch_size]
+    start = time.perf_counter()
+    for _ in range(max(1, repeats // 20)):
+        compiled_forest.predict_proba(batch)
+    batch_rows_per_second = len(batch) * max(1, repeats // 20) / (time.perf_counter() - start)
+    return single_ms, batch_rows_per_second
+
+
+def evaluate_variant(name, compiled_forest, X, labels, full_predictions, classes):
+    """
+    Accuracy against the dataset labels, agreement with the full model, per-class F1 and latency.
+    """
+    predictions = compiled_forest.predict(X)
+    per_class_f1 = f1_score(labels, predictions, labels=classes, average=None, zero_division=0)
+    single_ms, batch_rows_per_second = measure_latency(compiled_forest, X)
+    return {
+        'variant': name,
+        'trees': int(compiled_forest.n_estimators),
+        'max_depth': int(compiled_forest.max_depth),
+        'nodes': int(len(compiled_forest.feature)),
+        'accuracy': float(np.mean(predictions == labels)),
+        'agreement': float(np.mean(predictions == full_predictions)),
+        'f1': {str(label): float(score) for label, score in zip(classes, per_class_f1)},
+        'single_flow_ms': single_ms,
+        'batch_rows_per_second': batch_rows_per_second
+    }
+
+
+def print_report(report, classes):
+    """
+    Print one line per variant with its per-class F1 scores.
+    """
+    class_headers = "".join(f"{str(label)[:11]:>12}" for label in classes)
+    print(f"{'variant':<18}{'trees':>6}{'depth':>6}{'acc':>8}{'agree':>8}{'ms/flow':>9}{'rows/s':>10}{class_headers}")
+    for row in report:
+        class_scores = "".join(f"{row['f1'][str(label)]:>12.3f}" for label in classes)
+        print(
+            f"{row['variant']:<18}{row['trees']:>6}{row['max_depth']:>6}{row['accuracy']:>8.3f}"
+            f"{row['agreement']:>8.3f}{row['single_flow_ms']:>9.3f}{row['batch_rows_per_second']:>10.0f}{class_scores}"
+        )
+
+
+def main():
+    from models import nn_model
+    from network.precompute import replay_data_path
+    from network.replay_store import load_traffic_data
+
+    parser = argparse.ArgumentParser(
+        description="Build smaller variants of the random forest and report accuracy against latency. "
+                    "A saved variant is served with INFERENCE_ENGINE=numpy and FOREST_ARTIFACT set to its forest "
+                    "directory; variants with a model.pkl can also replace the pickled model."
+    )
+    parser.add_argument('--data', default=replay_data_path, help="Replay dataset with an 'Attack Type' column")
+    parser.add_argument('--rows', type=int, default=100000, help="Maximum number of rows to use")
+    parser.add_argument('--trees', type=int, nargs='*', default=[10, 25, 50], help="Tree subset sizes")
+    parser.add_argument('--depths', type=int, nargs='*', default=[8, 12, 16], help="Depth caps for the full forest")
+    parser.add_argument('--distill', nargs='*', default=['20x10', '50x14'],
+                        help="Distilled forests as TREESxDEPTH, trained on half of the rows")
+    parser.add_argument('--save', action='store_true', help=f"Save every variant under {variants_path}")
+    parser.add_argument('--report', default=None, help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    traffic_data = load_traffic_data(args.data)
+    if len(traffic_data) > args.rows:
+        traffic_data = traffic_data.sample(args.rows, random_state=0)
+
+    # Scale exactly like process_network_traffic; half the rows train distilled forests, the other half evaluate
+    X = nn_model.scaler.transform(traffic_data.reindex(columns=nn_model.model_columns, fill_value=0))
+    labels = traffic_data['Attack Type'].astype(str).to_numpy()
+    order = np.random.default_rng(0).permutation(len(X))
+    train_rows, test_rows = order[:len(X) // 2], order[len(X) // 2:]
+
+    model = nn_model.get_model()
+    full_forest = CompiledForest.from_sklearn(model)
+    full_predictions = full_forest.predict(X).astype(str)
+    classes = [str(label) for label in nn_model.le.classes_]
+
+    variants = [('full', full_forest, model)]
+    for n_trees in args.trees:
+        if n_trees < len(model.estimators_):
+            subset = subset_forest(model, n_trees)
+            variants.append((f"trees={n_trees}", CompiledForest.from_sklearn(subset), subset))
+    variants += [(f"depth={depth}", full_forest.truncated(depth), None)
+                 for depth in args.depths if depth < full_forest.max_depth]
+    for spec in args.distill:
+        n_trees, max_depth = (int(part) for part in spec.split('x'))
+        student = distill_forest(X[train_rows], full_predictions[train_rows], n_trees, max_depth)
+        # Predict over the full model's classes, so class indices mean the same for both
+        compiled_student = CompiledForest.from_sklearn(student).with_classes(full_forest.classes_)
+        if list(student.classes_) != list(model.classes_):
+            print(f"distill={spec} saw {len(student.classes_)} of {len(model.classes_)} classes, "
+                  f"saving only its compiled forest")
+            student = None
+        variants.append((f"distill={spec}", compiled_student, student))
+
+    report = [
+        evaluate_variant(name, compiled_forest, X[test_rows], labels[test_rows], full_predictions[test_rows], classes)
+        for name, compiled_forest, _ in variants
+    ]
+    print_report(report, classes)
+
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+    if args.save:
+        # The manifest names the variant and the model file it was derived from
+        for name, compiled_forest, forest in variants[1:]:
+            variant_path = os.path.join(variants_path, name.replace('=', '-'))
+            compiled_forest.save(os.path.join(variant_path, 'forest'), source_path=nn_model.model_path, variant=name)
+            if forest is not None:
+                joblib.dump(forest, os.path.join(variant_path, 'model.pkl'))
+        print(f"Variants saved under: {variants_path}")
+
+
+if __name__ == "__main__":
+    main()
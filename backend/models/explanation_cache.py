@@ -0,0 +1,98 @@
+import hashlib
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+
+
+class ExplanationCache:
+    """
+    LRU cache with a time-to-live for explanation and recommendation results.
+
+    Entries are keyed by a hash of the scaled feature vector, the predicted class and the
+    explanation mode. With a quantum above zero, features are rounded to multiples of it
+    before hashing so near-identical flows share an entry.
+    """
+
+    def __init__(self, max_size=4096, ttl_seconds=600, quantum=0.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.quantum = quantum
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def key(self, scaled_row, predicted_class, explanation_mode):
+        """
+        Build the cache key of one scaled feature vector.
+        """
+        row = np.asarray(scaled_row, dtype=np.float64)
+        if self.quantum > 0:
+            row = np.round(row / self.quantum).astype(np.int64)
+        digest = hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest()
+        return f"{explanation_mode}:{int(predicted_class)}:{digest}"
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None on a miss or an expired entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if self.ttl_seconds and expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store value under key, evicting the least recently used entries above max_size.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Drop every entry and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        """
+        Get the size of the cache and its hit/miss/eviction counters.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'quantum': self.quantum,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,274 @@
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+import sklearn
+
+# scikit-learn < 1.4 stores class counts in tree_.value and normalises them in predict_proba;
+# later versions store the fractions directly and return them unchanged
+SKLEARN_NORMALISES_VALUES = tuple(int(part) for part in sklearn.__version__.split('.')[:2]) < (1, 4)
+
+# Version of the on-disk layout written by CompiledForest.save
+ARTIFACT_FORMAT_VERSION = 1
+
+# Node arrays stored as one .npy file each
+NODE_ARRAYS = ('feature', 'threshold', 'children_left', 'children_right', 'missing_go_to_left', 'node_values', 'roots')
+
+
+def forest_path_for(model_path):
+    """
+    Path of the compiled forest artifact for a pickled model.
+    """
+    return os.path.splitext(model_path)[0] + '.forest'
+
+
+def file_digest(path):
+    """
+    SHA-1 of a file's contents, None for a missing file.
+    """
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha1()
+    with open(path, 'rb') as artifact_file:
+        for block in iter(lambda: artifact_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CompiledForest:
+    """
+    Random forest flattened into contiguous node arrays and evaluated with vectorized NumPy.
+
+    Every tree of the forest is stored back to back in the same arrays, so one batch is
+    evaluated for all trees at once by walking a (trees, rows) matrix of node indices
+    down one level per step. Leaves point at themselves, so rows that reach a leaf early
+    simply stay there until the deepest tree is done.
+    """
+
+    def __init__(self, feature, threshold, children_left, children_right, missing_go_to_left,
+                 node_values, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.missing_go_to_left = missing_go_to_left
+        self.node_values = node_values  # Normalised class probabilities of every node
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = max_depth
+        self.n_estimators = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """
+        Flatten a fitted scikit-learn RandomForestClassifier.
+        """
+        features, thresholds, lefts, rights, missing_lefts, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back to themselves and test feature 0 so traversal can run a fixed number of steps
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            missing_left = getattr(tree, 'missing_go_to_left', None)
+            missing_lefts.append(np.zeros(n_nodes, dtype=bool) if missing_left is None else missing_left.astype(bool))
+
+            # Turn node values into probabilities the same way DecisionTreeClassifier.predict_proba does
+            value = tree.value[:, 0, :forest.n_classes_]
+            if SKLEARN_NORMALISES_VALUES:
+                normalizer = value.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            values.append(value)
+
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            children_left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            children_right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            missing_go_to_left=np.ascontiguousarray(np.concatenate(missing_lefts)),
+            node_values=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            classes=forest.classes_,
+            max_depth=max_depth
+        )
+
+    def save(self, directory, source_path=None, variant=None):
+        """
+        Write the node arrays as raw .npy files plus a JSON manifest.
+        source_path is the pickled model the forest was compiled from or, for a variant (a
+        smaller forest derived from that model, e.g. 'trees=10'), derived from; the manifest
+        records its size and SHA-1 so a changed model file is noticed.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in NODE_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        manifest = {
+            'version': ARTIFACT_FORMAT_VERSION,
+            'classes': self.classes_.tolist(),
+            'max_depth': int(self.max_depth),
+            'source_size': os.path.getsize(source_path) if source_path else None,
+            'source_sha1': file_digest(source_path) if source_path else None,
+            'variant': variant
+        }
+        with open(os.path.join(directory, 'manifest.json'), 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load a saved forest with its node arrays memory mapped, so every process
+        using the artifact shares the same pages. Returns the forest and its manifest.
+        """
+        with open(os.path.join(directory, 'manifest.json')) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest['version'] != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled forest version {manifest['version']}")
+
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in NODE_ARRAYS}
+        forest = cls(
+            classes=np.asarray(manifest['classes'], dtype=object),
+            max_depth=manifest['max_depth'],
+            **arrays
+        )
+        return forest, manifest
+
+    def truncated(self, max_depth):
+        """
+        Return the forest with every tree cut off at max_depth.
+        Traversal simply stops after max_depth steps, and the class probabilities of the
+        nodes reached there are used as if they were leaves. The node arrays are shared.
+        """
+        return CompiledForest(
+            self.feature, self.threshold, self.children_left, self.children_right, self.missing_go_to_left,
+            self.node_values, self.roots, self.classes_, min(max_depth, self.max_depth)
+        )
+
+    def with_classes(self, classes):
+        """
+        Return the forest predicting over classes, a superset of its own in any order.
+        Classes the forest never saw get probability 0, so a forest trained on some of a
+        model's classes gives probabilities in the same columns as the model.
+        """
+        classes = np.asarray(classes, dtype=object)
+        positions = [list(classes).index(label) for label in self.classes_]
+        node_values = np.zeros((len(self.node_values), len(classes)), dtype=np.float64)
+        node_values[:, positions] = self.node_values
+        return CompiledForest(
+            self.feature, self.threshold, self.children_left, self.children_right, self.missing_go_to_left,
+            node_values, self.roots, classes, self.max_depth
+        )
+
+    def apply(self, X):
+        """
+        Return the leaf reached by every row in every tree, as a (trees, rows) array of node indices.
+        """
+        # Trees compare float32 inputs against float64 thresholds, as scikit-learn does
+        X = np.asarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[np.newaxis, :]
+
+        nodes = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            values = flat_X[row_offsets + self.feature[nodes]]
+            go_left = (values <= self.threshold[nodes]) | (np.isnan(values) & self.missing_go_to_left[nodes])
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        """
+        Average the leaf class probabilities over all trees.
+        Trees are summed one at a time in order so the result matches scikit-learn bit for bit.
+        """
+        leaves = self.apply(X)
+        probabilities = np.zeros((leaves.shape[1], len(self.classes_)), dtype=np.float64)
+        for tree_leaves in leaves:
+            probabilities += self.node_values[tree_leaves]
+        probabilities /= self.n_estimators
+        return probabilities
+
+    def feature_contributions(self, X, class_indices):
+        """
+        Path-based (Saabas) attributions for one class per row, as a (rows, features) array.
+
+        While walking down each tree, the change in the class probability between a node and
+        the child that is taken is credited to the feature split on at that node. Averaged over
+        the trees, the contributions plus the mean root value add up to the predicted probability.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[np.newaxis, :]
+        class_indices = np.asarray(class_indices, dtype=np.intp)[np.newaxis, :]
+
+        contributions = np.zeros(n_rows * n_features, dtype=np.float64)
+        nodes = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            features = self.feature[nodes]
+            values = flat_X[row_offsets + features]
+            go_left = (values <= self.threshold[nodes]) | (np.isnan(values) & self.missing_go_to_left[nodes])
+            children = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+
+            # Leaves are their own children, so they add nothing once reached
+            deltas = self.node_values[children, class_indices] - self.node_values[nodes, class_indices]
+            contributions += np.bincount(
+                (row_offsets + features).ravel(), weights=deltas.ravel(), minlength=contributions.size
+            )
+            nodes = children
+        return contributions.reshape(n_rows, n_features) / self.n_estimators
+
+    def predict(self, X):
+        """
+        Predict the most probable class of every row.
+        """
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def verify_against_sklearn(forest, compiled_forest, X):
+    """
+    Check that the compiled forest reproduces scikit-learn's probabilities exactly.
+    Returns whether every probability is bit-for-bit equal and the largest absolute difference.
+    """
+    expected = forest.predict_proba(X)
+    actual = compiled_forest.predict_proba(X)
+    return bool(np.array_equal(expected, actual)), float(np.max(np.abs(expected - actual)))
+
+
+def main():
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Export a pickled random forest as a memory-mappable compiled forest.")
+    parser.add_argument('model', help="Pickled RandomForestClassifier")
+    parser.add_argument('--output', default=None, help="Artifact directory (default: next to the model with a .forest suffix)")
+    args = parser.parse_args()
+
+    forest = joblib.load(args.model)
+    compiled_forest = CompiledForest.from_sklearn(forest)
+
+    # Only export a forest that reproduces scikit-learn exactly
+    check_data = np.random.default_rng(0).normal(size=(256, forest.n_features_in_))
+    matches, max_difference = verify_against_sklearn(forest, compiled_forest, check_data)
+    if not matches:
+        raise SystemExit(f"Compiled forest does not match scikit-learn (max difference {max_difference}), not exported")
+
+    output = args.output or forest_path_for(args.model)
+    compiled_forest.save(output, source_path=args.model)
+    node_bytes = sum(getattr(compiled_forest, name).nbytes for name in NODE_ARRAYS)
+    print(f"Exported {compiled_forest.n_estimators} trees ({node_bytes / 1e6:.1f} MB of node arrays) to: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
-import joblib
 import os
 import pandas as pd
 import numpy as np
-import shap  # Import SHAP
+import threading
+import time
 from collections import defaultdict
+from contextlib import contextmanager
+from .forest_engine import forest_path_for
+from .explanation_cache import ExplanationCache
+from .cascade import cascade_path
+from .bundle import ModelBundle, artifact_mtimes
+from .shared_stats import SharedAttackStats
+from .pending_rows import SharedPendingRows
 
 # Define the base directory of the project (backend/)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -13,14 +20,265 @@ model_path = os.path.join(BASE_DIR, 'random_forest_model.pkl')  # Absolute path
 scaler_path = os.path.join(BASE_DIR, 'scaler.pkl')  # Absolute path to the scaler
 label_encoder_path = os.path.join(BASE_DIR, 'label_encoder.pkl')  # Absolute path to the label encoder
 
-# Load the trained model (scikit-learn model)
-model = joblib.load(model_path)
+# Compiled forest exported next to the model, memory mapped instead of unpickled. FOREST_ARTIFACT
+# serves another forest directory instead, such as a variant saved by compact.py --save
+forest_artifact_path = os.getenv('FOREST_ARTIFACT') or forest_path_for(model_path)
 
-# Load the scaler used during training
-scaler = joblib.load(scaler_path)
+# Touched to make every process serving the model reload it, not only the one asked to
+reload_trigger_path = os.path.join(BASE_DIR, 'reload.trigger')
 
-# Load the LabelEncoder for 'Attack Type'
-le = joblib.load(label_encoder_path)
+def load_bundle():
+    """
+    Load the model artifacts from their standard paths into a new bundle.
+    """
+    return ModelBundle(
+        model_path, scaler_path, label_encoder_path, forest_artifact_path, cascade_path, reload_trigger_path
+    )
+
+# The model artifacts used for scoring, replaced as a whole by reload_models. The scikit-learn
+# model is loaded on first use; with the numpy engine and an exported compiled forest it is
+# only needed for exact SHAP explanations.
+_bundle = load_bundle()
+_reload_lock = threading.Lock()
+
+# The scaler and LabelEncoder of the current bundle
+scaler = _bundle.scaler
+le = _bundle.le
+
+def get_bundle():
+    """
+    Return the model bundle currently used for scoring.
+    """
+    return _bundle
+
+def get_model():
+    """
+    Return the trained scikit-learn model of the current bundle.
+    """
+    return _bundle.model()
+
+def get_explainer():
+    """
+    Return the SHAP TreeExplainer of the current bundle, shared by every request.
+    """
+    return _bundle.explainer()
+
+# Inference engine used for predictions: 'sklearn' or 'numpy' (compiled forest)
+INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'sklearn')
+
+def get_compiled_forest():
+    """
+    Return the compiled NumPy forest of the current bundle, or None if it is unavailable.
+    """
+    return _bundle.compiled_forest()
+
+def predict_proba(X, engine=None, bundle=None):
+    """
+    Predict class probabilities with the selected inference engine.
+    Falls back to scikit-learn when the compiled forest is unavailable.
+    """
+    return (bundle or _bundle).predict_proba(X, engine or INFERENCE_ENGINE)
+
+def get_classes(engine=None, bundle=None):
+    """
+    Class labels in the column order of predict_proba.
+    """
+    return (bundle or _bundle).classes(engine or INFERENCE_ENGINE)
+
+# Optional two-stage cascade: a small pre-filter clears confidently benign flows and
+# only the remaining ones go through the full forest and the explainer
+CASCADE_ENABLED = os.getenv('CASCADE', '0') == '1'
+CASCADE_INTERPRETATION = "Cleared as benign by the pre-filter; not explained."
+
+_cascade_stats_lock = threading.Lock()
+cascade_stats = {'rows': 0, 'cleared': 0}
+
+def get_cascade():
+    """
+    Return the benign pre-filter of the current bundle, or None if it has not been trained.
+    """
+    return _bundle.cascade()
+
+def predict_with_cascade(X, bundle=None):
+    """
+    Predict class probabilities, letting the pre-filter clear confidently benign rows first.
+    Returns the probabilities and a mask of the rows cleared by the pre-filter; cleared rows
+    only get a probability for the benign class.
+    """
+    bundle = bundle or _bundle
+    cleared = np.zeros(len(X), dtype=bool)
+    cascade = bundle.cascade() if CASCADE_ENABLED else None
+    if cascade is None:
+        return predict_proba(X, bundle=bundle), cleared
+
+    cleared, benign_probability = cascade.clear(X)
+    classes = list(get_classes(bundle=bundle))
+    probabilities = np.zeros((len(X), len(classes)))
+    probabilities[cleared, classes.index(cascade.benign_label)] = benign_probability[cleared]
+    if not cleared.all():
+        probabilities[~cleared] = predict_proba(X[~cleared], bundle=bundle)
+
+    with _cascade_stats_lock:
+        cascade_stats['rows'] += len(X)
+        cascade_stats['cleared'] += int(cleared.sum())
+    return probabilities, cleared
+
+def get_cascade_stats():
+    """
+    Get how many rows the pre-filter has seen and cleared.
+    """
+    with _cascade_stats_lock:
+        rows, cleared = cascade_stats['rows'], cascade_stats['cleared']
+    return {
+        'enabled': CASCADE_ENABLED and get_cascade() is not None,
+        'rows': rows,
+        'cleared': cleared,
+        'cleared_rate': round(cleared / rows, 4) if rows else 0.0
+    }
+
+# Explanation mode: 'shap' (exact TreeSHAP), 'fast' (path contributions), 'none',
+# or 'deferred' (score only and explain later through get_explanation)
+EXPLANATION_MODES = ('shap', 'fast', 'none', 'deferred')
+EXPLANATION_MODE = os.getenv('EXPLANATION_MODE', 'shap')
+
+def warm_up(bundle=None):
+    """
+    Build the lazily created parts of a bundle that the configured modes use.
+    Called in the gunicorn master before forking so workers share them instead of each
+    building a copy, and on a new bundle before it is swapped in.
+    """
+    bundle = bundle or _bundle
+    if INFERENCE_ENGINE != 'numpy':
+        bundle.model()
+    if EXPLANATION_MODE == 'shap':
+        bundle.explainer()
+    if INFERENCE_ENGINE == 'numpy' or EXPLANATION_MODE == 'fast':
+        bundle.compiled_forest()
+    if CASCADE_ENABLED:
+        bundle.cascade()
+
+# Explanation and recommendation results keyed by the scaled feature vector
+explanation_cache = ExplanationCache(
+    max_size=int(os.getenv('EXPLANATION_CACHE_SIZE', 4096)),
+    ttl_seconds=float(os.getenv('EXPLANATION_CACHE_TTL', 600)),
+    quantum=float(os.getenv('EXPLANATION_CACHE_QUANTUM', 0))
+)
+
+# Number of scored rows kept for on-demand explanations; older rows are overwritten
+MAX_PENDING_EXPLANATIONS = int(os.getenv('MAX_PENDING_EXPLANATIONS', 10000))
+
+def reload_models():
+    """
+    Load the model artifacts again and swap them in as one bundle.
+    The new bundle is loaded, checked and warmed up before the swap, and requests already
+    running finish on the bundle they started with. The current bundle stays in use if
+    anything fails. Returns the status of the new bundle.
+    """
+    global _bundle, scaler, le
+    with _reload_lock:
+        bundle = load_bundle()
+        if bundle.scaler.n_features_in_ != len(model_columns):
+            raise ValueError(f"Scaler expects {bundle.scaler.n_features_in_} features, not {len(model_columns)}")
+
+        # Warm up, then score a small batch so the first real request does not pay for it
+        warm_up(bundle)
+        check_data = bundle.scaler.transform(pd.DataFrame(np.zeros((8, len(model_columns))), columns=model_columns))
+        predict_with_cascade(check_data, bundle)
+
+        _bundle = bundle
+        scaler, le = bundle.scaler, bundle.le
+
+        # Results of the previous model are no longer valid
+        explanation_cache.clear()
+        for listener in _reload_listeners:
+            try:
+                listener(bundle)
+            except Exception as e:
+                print(f"Error in model reload listener: {e}")
+    print(f"Model bundle {bundle.version} loaded and swapped in")
+    return bundle.status()
+
+# Called with the new bundle after every reload, e.g. to drop results of the previous model
+_reload_listeners = []
+
+def on_model_reload(listener):
+    """
+    Register a function called with the new bundle whenever the model is reloaded.
+    """
+    _reload_listeners.append(listener)
+
+def request_reload():
+    """
+    Reload the model in this process and ask every other process serving it to reload
+    too, by touching the reload trigger file they check (see check_reload_trigger).
+    Returns the status of the new bundle.
+    """
+    with open(reload_trigger_path, 'a'):
+        pass
+    os.utime(reload_trigger_path)
+    return reload_models()
+
+# Trigger file modification time a reload was last started for
+_trigger_seen = None
+
+def check_reload_trigger():
+    """
+    Start a reload in the background if another process touched the reload trigger since
+    the current bundle was loaded. A single stat call, cheap enough for every request.
+    """
+    global _trigger_seen
+    try:
+        trigger_mtime = os.path.getmtime(reload_trigger_path)
+    except OSError:
+        return
+    if trigger_mtime == _bundle.source_mtimes.get(reload_trigger_path) or trigger_mtime == _trigger_seen:
+        return
+    _trigger_seen = trigger_mtime
+
+    def reload_for_trigger():
+        try:
+            reload_models()
+        except Exception as e:
+            print(f"Model reload failed, keeping the current model: {e}")
+
+    threading.Thread(target=reload_for_trigger, name="model-reload", daemon=True).start()
+
+# Seconds between checks of the model files for changes (0 disables the watcher)
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', 0))
+_model_watcher = None
+
+def start_model_watcher(interval=MODEL_WATCH_INTERVAL):
+    """
+    Reload the models whenever their files change.
+    A change is only acted on once the files have stayed the same for a whole interval,
+    so a copy in progress is never loaded. The watcher restarts in forked worker processes.
+    """
+    global _model_watcher
+    if interval <= 0 or (_model_watcher is not None and _model_watcher.is_alive()):
+        return
+
+    def watch():
+        last_seen = None
+        failed = None
+        while True:
+            time.sleep(interval)
+            current = artifact_mtimes(_bundle.artifact_paths())
+            if current == _bundle.source_mtimes or current == failed:
+                last_seen = None
+                continue
+            if current != last_seen:
+                last_seen = current
+                continue
+            try:
+                reload_models()
+            except Exception as e:
+                print(f"Model reload failed, keeping the current model: {e}")
+                failed = current
+
+    if _model_watcher is None:
+        os.register_at_fork(after_in_child=lambda: start_model_watcher(interval))
+    _model_watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+    _model_watcher.start()
 
 # Define the feature columns (model_columns)
 model_columns = [
@@ -125,15 +383,48 @@ feature_stats = {
     'Idle Min': {'mean': 7920031.01, 'std': 23363418.93}
 }
 
-# Dictionary to store feature frequency for each attack type
-attack_feature_stats = {
-    'DoS': defaultdict(int),
-    'DDoS': defaultdict(int),
-    'Port Scan': defaultdict(int),
-    'Brute Force': defaultdict(int),
-    'Bot': defaultdict(int),
-    'Web Attack': defaultdict(int)
-}
+# Attack types whose influential features are counted
+ATTACK_TYPES = ['DoS', 'DDoS', 'Port Scan', 'Brute Force', 'Bot', 'Web Attack']
+
+# Backend of the feature frequency counters: 'shared' (shared memory, one set of counters
+# for every worker process on the host) or 'local' (private to this process)
+ATTACK_STATS_BACKEND = os.getenv('ATTACK_STATS_BACKEND', 'shared')
+
+def create_attack_feature_stats():
+    """
+    Create the attack type x feature frequency counters.
+    Falls back to per-process counters if shared memory is not available.
+    """
+    if ATTACK_STATS_BACKEND == 'shared':
+        try:
+            return SharedAttackStats(ATTACK_TYPES, model_columns, shared=True, name=os.getenv('ATTACK_STATS_SEGMENT'))
+        except Exception as e:
+            print(f"Shared attack feature statistics unavailable ({e}), using per-process counters")
+    return SharedAttackStats(ATTACK_TYPES, model_columns, shared=False)
+
+# Feature frequency for each attack type
+attack_feature_stats = create_attack_feature_stats()
+
+# Backend of the rows kept for on-demand explanations: 'shared' (shared memory, so any
+# worker can explain a row scored by another) or 'local' (private to this process)
+PENDING_EXPLANATIONS_BACKEND = os.getenv('PENDING_EXPLANATIONS_BACKEND', 'shared')
+
+def create_pending_explanations():
+    """
+    Create the store of rows kept for on-demand explanations.
+    Falls back to a per-process store if shared memory is not available.
+    """
+    if PENDING_EXPLANATIONS_BACKEND == 'shared':
+        try:
+            return SharedPendingRows(
+                len(model_columns), MAX_PENDING_EXPLANATIONS, shared=True, name=os.getenv('PENDING_EXPLANATIONS_SEGMENT')
+            )
+        except Exception as e:
+            print(f"Shared pending explanations unavailable ({e}), using a per-process store")
+    return SharedPendingRows(len(model_columns), MAX_PENDING_EXPLANATIONS, shared=False)
+
+# Scored rows kept for on-demand explanations
+pending_explanations = create_pending_explanations()
 
 # Add this function to get the statistics
 def get_attack_feature_stats():
@@ -141,111 +432,158 @@ def get_attack_feature_stats():
     Get the current statistics of influential features for each attack type.
     Returns a dictionary with attack types and their feature frequencies.
     """
-    return {
-        attack_type: dict(frequencies)
-        for attack_type, frequencies in attack_feature_stats.items()
-    }
+    return attack_feature_stats.as_dict()
 
-def process_network_traffic(df):
+# Cumulative time spent in each stage of process_network_traffic
+stage_timings = defaultdict(lambda: {'calls': 0, 'rows': 0, 'total_ms': 0.0})
+_stage_timings_lock = threading.Lock()
+
+@contextmanager
+def timed_stage(stage, rows=1):
+    """
+    Time a block of process_network_traffic and add it to stage_timings.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with _stage_timings_lock:
+            stage_timings[stage]['calls'] += 1
+            stage_timings[stage]['rows'] += rows
+            stage_timings[stage]['total_ms'] += elapsed_ms
+
+def get_stage_timings():
+    """
+    Get the per-stage timing breakdown of process_network_traffic.
+    Returns total and average milliseconds per call and per row for each stage.
+    """
+    with _stage_timings_lock:
+        return {
+            stage: {
+                'calls': timing['calls'],
+                'rows': timing['rows'],
+                'total_ms': round(timing['total_ms'], 3),
+                'mean_ms_per_call': round(timing['total_ms'] / timing['calls'], 3) if timing['calls'] else 0.0,
+                'mean_ms_per_row': round(timing['total_ms'] / timing['rows'], 3) if timing['rows'] else 0.0
+            }
+            for stage, timing in stage_timings.items()
+        }
+
+def reset_stage_timings():
+    """
+    Clear the per-stage timing breakdown.
+    """
+    with _stage_timings_lock:
+        stage_timings.clear()
+
+def get_attack_feature_stats_version():
+    """
+    Get the version of the attack feature statistics, which changes whenever they are updated.
+    """
+    return attack_feature_stats.version()
+
+def record_attack_features(prediction, feature_importance):
+    """
+    Update the frequency counters of the top features for a detected attack type.
+    """
+    if feature_importance:
+        attack_feature_stats.record(prediction, feature_importance.keys())
+
+def process_network_traffic(df, explanation_mode=None, record_features=True):
     """
     Process the incoming network traffic data.
     Scale the data using the same scaler used in training.
+    Every row of df is scored in one pass through the scaler, the model and the
+    explainer, and one result record is returned per row.
+    explanation_mode overrides EXPLANATION_MODE for this call. With record_features False
+    the rows do not count towards the attack feature statistics.
     """
     try:
-        # Store display columns
-        display_columns = ['Source IP', 'Destination IP', 'Source Port', 'Protocol']
-        display_data = df[display_columns].copy()
-        
-        # Drop non-numeric columns and labels
-        columns_to_drop = ['Attack Type', 'Source IP', 'Destination IP', 'Source Port', 'Protocol', 'Label']
-        df_for_prediction = df.drop(columns=columns_to_drop, errors='ignore')
-        
-        # Ensure columns match exactly with model_columns and in the same order
-        df_for_prediction = df_for_prediction.reindex(columns=model_columns, fill_value=0)
-        
-        # Scale the data using the same scaler used in training
-        X = scaler.transform(df_for_prediction)
+        # Use one model bundle for the whole request, even if a reload swaps it meanwhile
+        bundle = get_bundle()
+        n_rows = len(df)
+        with timed_stage('prepare', n_rows):
+            # Store display columns
+            display_columns = ['Source IP', 'Destination IP', 'Source Port', 'Protocol']
+            display_data = df[display_columns].reset_index(drop=True)
+            
+            # Drop non-numeric columns and labels
+            columns_to_drop = ['Attack Type', 'Source IP', 'Destination IP', 'Source Port', 'Protocol', 'Label']
+            df_for_prediction = df.drop(columns=columns_to_drop, errors='ignore')
+            
+            # Ensure columns match exactly with model_columns and in the same order
+            df_for_prediction = df_for_prediction.reindex(columns=model_columns, fill_value=0)
         
-        # Make predictions
-        predictions = model.predict(X)
-        predicted_probabilities = model.predict_proba(X)
+        with timed_stage('scale', n_rows):
+            # Scale the whole batch using the same scaler used in training
+            X = bundle.scaler.transform(df_for_prediction)
         
-        # Debug print predictions
-        print(f"Prediction: {predictions[0]}")
-        print(f"Probabilities: {predicted_probabilities[0]}")
+        with timed_stage('predict', n_rows):
+            # Traverse the forest once; the predicted class is the most probable one,
+            # exactly as model.predict would derive it
+            predicted_probabilities, cleared = predict_with_cascade(X, bundle)
+            predicted_classes = np.argmax(predicted_probabilities, axis=1)
+            predictions = get_classes(bundle=bundle)[predicted_classes]
         
         # Check if we have valid predictions
         if len(predictions) == 0 or len(predicted_probabilities) == 0:
             raise ValueError("No predictions generated")
-            
-        # Get the first prediction and probability
-        prediction = predictions[0]
-        probability = predicted_probabilities[0]
+
+        # Debug print predictions
+        print(f"Scored {len(predictions)} flow(s), first prediction: {predictions[0]}")
         
-        # Generate explanation using the scaled data
-        shap_explanation = explain_with_shap(
-            scaled_data=X,
-            row_index=0,
-            model_columns=model_columns
-        ) or {'interpretation': '', 'feature_importance': {}}
+        explanation_mode = explanation_mode or EXPLANATION_MODE
+        with timed_stage('explain', n_rows):
+            # Generate explanations for the whole batch using the scaled data,
+            # except for the rows the pre-filter cleared as benign
+            explained_rows = np.flatnonzero(~cleared)
+            shap_explanations = [
+                {'interpretation': CASCADE_INTERPRETATION, 'feature_importance': {}} for _ in range(n_rows)
+            ]
+            if len(explained_rows):
+                explained = explain_predictions(
+                    scaled_data=X[explained_rows],
+                    predicted_classes=predicted_classes[explained_rows],
+                    explanation_mode=explanation_mode,
+                    bundle=bundle
+                )
+                for row_index, explanation in zip(explained_rows, explained):
+                    shap_explanations[row_index] = explanation
         
-        # Unscale only the specific values needed for frontend display
-        frontend_values = {}
-        columns_to_unscale = [
-            'Destination Port', 'Flow Duration', 'Flow Bytes/s',
-            'Total Fwd Packets', 'Total Backward Packets', 'Flow Packets/s',
-            'Fwd Packet Length Mean', 'Fwd Packet Length Max', 'Fwd Packet Length Min',
-            'Bwd Packet Length Mean', 'Bwd Packet Length Max', 'Bwd Packet Length Min',
-            'Fwd IAT Mean', 'Fwd IAT Max', 'Fwd IAT Min',
-            'Bwd IAT Mean', 'Bwd IAT Max', 'Bwd IAT Min',
-            'PSH Flag Count', 'ACK Flag Count', 'SYN Flag Count',
-            'Active Mean', 'Active Max', 'Active Min',
-            'Idle Mean', 'Idle Max', 'Idle Min'
-        ]
+        with timed_stage('assemble', n_rows):
+            # Unscale only the specific values needed for frontend display
+            traffic_stats = unscale_traffic_stats(df_for_prediction)
 
-        for column in columns_to_unscale:
-            if column in feature_stats and column in df_for_prediction:
-                scaled_value = float(df_for_prediction[column].iloc[0])
-                mean = feature_stats[column]['mean']
-                std = feature_stats[column]['std']
-                
-                # Unscale: original = (scaled * std) + mean
-                unscaled_value = scaled_value * std + mean
-                
-                # Ensure non-negative values for ports and durations
-                if column in ['Destination Port', 'Flow Duration']:
-                    unscaled_value = max(0, unscaled_value)
-                    
-                # Round port numbers to integers
-                if column == 'Destination Port':
-                    unscaled_value = int(round(unscaled_value))
-                else:
-                    unscaled_value = round(unscaled_value, 2)  # Format to two decimal places
+            results = []
+            for row_index, (prediction, probability) in enumerate(zip(predictions, predicted_probabilities)):
+                shap_explanation = shap_explanations[row_index] or {'interpretation': '', 'feature_importance': {}}
                 
-                frontend_values[column] = unscaled_value
-        
-        # After getting SHAP explanation, update the feature statistics
-        if prediction in attack_feature_stats:
-            # Update frequency counters for the top features
-            for feature in shap_explanation.get('feature_importance', {}).keys():
-                attack_feature_stats[prediction][feature] += 1
-
-        # Create response with unscaled values for frontend
-        response_data = {
-            'Source IP': str(display_data['Source IP'].iloc[0]),
-            'Destination IP': str(display_data['Destination IP'].iloc[0]),
-            'Source Port': int(display_data['Source Port'].iloc[0]),
-            'Protocol': str(display_data['Protocol'].iloc[0]),
-            'traffic_stats': frontend_values,
-            'prediction': prediction,
-            'recommendation': recommendation(prediction, shap_explanation.get('feature_importance', [])),
-            'interpretation': shap_explanation.get('interpretation', ''),
-            'feature_importance': shap_explanation.get('feature_importance', {}),
-            'confidence_score': float(max(probability) * 100),
-            'attack_feature_stats': get_attack_feature_stats()  # Add the statistics to the response
-        }
+                # After getting SHAP explanation, update the feature statistics
+                if record_features:
+                    record_attack_features(prediction, shap_explanation.get('feature_importance', {}))
+
+                # Create response with unscaled values for frontend
+                results.append({
+                    'Source IP': str(display_data['Source IP'].iloc[row_index]),
+                    'Destination IP': str(display_data['Destination IP'].iloc[row_index]),
+                    'Source Port': int(display_data['Source Port'].iloc[row_index]),
+                    'Protocol': str(display_data['Protocol'].iloc[row_index]),
+                    'traffic_stats': traffic_stats[row_index],
+                    'prediction': prediction,
+                    'recommendation': shap_explanation.get('recommendation') or recommendation(prediction, shap_explanation.get('feature_importance', [])),
+                    'interpretation': shap_explanation.get('interpretation', ''),
+                    'feature_importance': shap_explanation.get('feature_importance', {}),
+                    'confidence_score': float(max(probability) * 100)
+                })
+
+                # Keep the row so it can be explained later on request
+                if explanation_mode == 'deferred':
+                    results[-1]['explanation_id'] = register_pending_explanation(
+                        X[row_index], predicted_classes[row_index], bundle
+                    )
         
-        return pd.DataFrame([response_data])
+        return pd.DataFrame(results)
         
     except Exception as e:
         print(f"Error during processing: {e}")
@@ -254,83 +592,271 @@ def process_network_traffic(df):
         return None
 
 
-def explain_with_shap(scaled_data, row_index, model_columns):
+# Columns that are unscaled for frontend display
+columns_to_unscale = [
+    'Destination Port', 'Flow Duration', 'Flow Bytes/s',
+    'Total Fwd Packets', 'Total Backward Packets', 'Flow Packets/s',
+    'Fwd Packet Length Mean', 'Fwd Packet Length Max', 'Fwd Packet Length Min',
+    'Bwd Packet Length Mean', 'Bwd Packet Length Max', 'Bwd Packet Length Min',
+    'Fwd IAT Mean', 'Fwd IAT Max', 'Fwd IAT Min',
+    'Bwd IAT Mean', 'Bwd IAT Max', 'Bwd IAT Min',
+    'PSH Flag Count', 'ACK Flag Count', 'SYN Flag Count',
+    'Active Mean', 'Active Max', 'Active Min',
+    'Idle Mean', 'Idle Max', 'Idle Min'
+]
+
+
+# feature_stats as vectors aligned with model_columns (NaN for columns without statistics)
+feature_means = np.array([feature_stats.get(column, {}).get('mean', np.nan) for column in model_columns])
+feature_stds = np.array([feature_stats.get(column, {}).get('std', np.nan) for column in model_columns])
+
+def standardize_features(raw_df):
+    """
+    Standardize raw flow features with feature_stats, the way the replay dataset was
+    prepared: (raw - mean) / std. Missing values and columns without a spread become 0,
+    the training mean. Returns a DataFrame with model_columns in order.
+    """
+    raw_values = raw_df.reindex(columns=model_columns).to_numpy(dtype=np.float64)
+    has_spread = np.nan_to_num(feature_stds) > 0
+    standardized = np.zeros_like(raw_values)
+    np.divide(raw_values - feature_means, feature_stds, out=standardized, where=has_spread)
+    standardized[~np.isfinite(standardized)] = 0
+    return pd.DataFrame(standardized, columns=model_columns, index=raw_df.index)
+
+# Positions in model_columns of the display columns that can be unscaled
+unscale_columns = [column for column in columns_to_unscale if column in feature_stats and column in model_columns]
+unscale_positions = np.array([model_columns.index(column) for column in unscale_columns], dtype=np.intp)
+# Ports and durations are never negative
+non_negative_columns = np.isin(unscale_columns, ['Destination Port', 'Flow Duration'])
+# Port numbers are shown as integers
+port_position = unscale_columns.index('Destination Port') if 'Destination Port' in unscale_columns else None
+
+def unscale_traffic_stats(df_for_prediction):
+    """
+    Unscale the display columns of every row for the frontend.
+    df_for_prediction must have model_columns in order. Returns one dict per row.
+    """
+    # Unscale the whole batch at once: original = (scaled * std) + mean
+    scaled_values = df_for_prediction.iloc[:, unscale_positions].to_numpy(dtype=np.float64)
+    return format_traffic_stats(scaled_values * feature_stds[unscale_positions] + feature_means[unscale_positions])
+
+def raw_traffic_stats(raw_df):
     """
-    Generate feature importance explanations using SHAP values for a specific instance.
+    Build the display values of every row from raw (not standardized) flow features,
+    such as those of a CICFlowMeter export. Returns one dict per row.
+    """
+    raw_values = raw_df.reindex(columns=unscale_columns, fill_value=0).to_numpy(dtype=np.float64)
+    return format_traffic_stats(raw_values)
+
+def format_traffic_stats(unscaled_values):
+    """
+    Format an array of display values (rows x unscale_columns) for the frontend.
+    """
+    unscaled_values[:, non_negative_columns] = np.where(
+        unscaled_values[:, non_negative_columns] > 0, unscaled_values[:, non_negative_columns], 0
+    )
+
+    frontend_values = []
+    for row in unscaled_values.tolist():
+        # Format to two decimal places, with port numbers rounded to integers
+        row_values = {column: round(value, 2) for column, value in zip(unscale_columns, row)}
+        if port_position is not None:
+            row_values['Destination Port'] = int(round(row[port_position]))
+        frontend_values.append(row_values)
+    return frontend_values
+
+
+def select_class_shap_values(shap_values, row_index, class_index):
+    """
+    Pick the SHAP values of one row for one class.
+    Handles both the list-per-class layout and the (rows, features, classes) array layout.
+    """
+    if isinstance(shap_values, list):
+        return shap_values[class_index][row_index]
+    if shap_values.ndim == 3:
+        return shap_values[row_index, :, class_index]
+    return shap_values[row_index]  # Single class case
+
+
+def explain_predictions(scaled_data, predicted_classes, explanation_mode, bundle=None):
     """
+    Explain every row with the requested explanation mode.
+    'shap' gives exact SHAP values, 'fast' gives path contributions from the compiled
+    forest and 'none' skips the explanation stage entirely.
+    Results are looked up in explanation_cache first and only cache misses are explained.
+    bundle is the model bundle that scored the rows (default: the current one).
+    """
+    if explanation_mode not in EXPLANATION_MODES:
+        raise ValueError(f"Unknown explanation mode: {explanation_mode}")
+
+    if explanation_mode in ('none', 'deferred'):
+        return [{'interpretation': '', 'feature_importance': {}} for _ in range(len(scaled_data))]
+
+    bundle = bundle or get_bundle()
+    compiled_forest = None
+    if explanation_mode == 'fast':
+        compiled_forest = bundle.compiled_forest()
+        if compiled_forest is None:
+            print("Compiled forest unavailable, falling back to SHAP explanations")
+            explanation_mode = 'shap'
+
     try:
         # Convert scaled_data to numpy array if it's a DataFrame
         if isinstance(scaled_data, pd.DataFrame):
-            instance = scaled_data.values  # Get the entire dataset as a 2D array
+            instances = scaled_data.values
         else:
-            instance = scaled_data  # Assume it's already a NumPy array
-
-        # Create the SHAP explainer for the Random Forest model
-        explainer = shap.TreeExplainer(model)  # Use the Random Forest model
+            instances = scaled_data
 
-        # Calculate SHAP values for the entire dataset
-        shap_values = explainer.shap_values(instance)
+        # Look every row up in the cache
+        explanations = [None] * len(instances)
+        cache_keys = [None] * len(instances)
+        if explanation_cache.enabled:
+            for row_index, predicted_class in enumerate(predicted_classes):
+                # Explanations of different model versions never share cache entries
+                cache_keys[row_index] = explanation_cache.key(
+                    instances[row_index], predicted_class, f"{explanation_mode}@{bundle.version}"
+                )
+                explanations[row_index] = explanation_cache.get(cache_keys[row_index])
+        missing_rows = [row_index for row_index, explanation in enumerate(explanations) if explanation is None]
 
-        # Check if shap_values is a list (for multi-class)
-        if isinstance(shap_values, list):
-            # Get SHAP values for the predicted class of the specific row
-            predicted_class = np.argmax(model.predict_proba(instance[row_index:row_index + 1])[0])
-            shap_value_for_instance = shap_values[predicted_class][row_index]  # Access the SHAP values for the predicted class
-        else:
-            shap_value_for_instance = shap_values[row_index]  # Single class case
-
-        # Ensure shap_value_for_instance is a 1D array
-        if isinstance(shap_value_for_instance, np.ndarray) and shap_value_for_instance.ndim > 1:
-            shap_value_for_instance = shap_value_for_instance.flatten()
-
-        # Calculate feature importance from SHAP values
-        feature_importance = {model_columns[i]: float(shap_value_for_instance[i]) for i in range(len(model_columns))}
-
-        # Filter for positive contributions only
-        positive_features = {feature: importance for feature, importance in feature_importance.items() if importance > 0}
-
-        # Sort features by importance and get top 5
-        sorted_positive_features = dict(sorted(
-            positive_features.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )[:5])  # Get top 5 features
-
-        # Generate interpretation with feature frequencies
-        interpretation = "Top 5 Positive SHAP values for the instance:\n"
-        interpretation += "\n".join([
-            f"{feature}: {importance:.3f}" 
-            for feature, importance in sorted_positive_features.items()
-        ])
-
-        # Add attack type statistics to interpretation
-        interpretation += "\n\nFeature Frequency by Attack Type:\n"
-        for attack_type, features in attack_feature_stats.items():
-            if features:  # Only show attacks that have recorded features
-                interpretation += f"\n{attack_type}:\n"
-                sorted_features = sorted(
-                    features.items(),
-                    key=lambda x: x[1],
-                    reverse=True
+        # Explain the cache misses in one batch
+        if missing_rows:
+            if explanation_mode == 'fast':
+                computed = explain_with_path_contributions(
+                    compiled_forest, instances[missing_rows], model_columns, predicted_classes[missing_rows]
+                )
+            else:
+                computed = explain_with_shap(
+                    instances[missing_rows], model_columns, predicted_classes[missing_rows], bundle.explainer()
                 )
-                interpretation += "\n".join([
-                    f"  {feature}: {count} times"
-                    for feature, count in sorted_features
-                ])
 
-        return {
-            'interpretation': interpretation,
-            'feature_importance': sorted_positive_features
-        }
+            for row_index, explanation in zip(missing_rows, computed):
+                prediction = get_classes(bundle=bundle)[predicted_classes[row_index]]
+                explanation['recommendation'] = recommendation(prediction, explanation['feature_importance'])
+                explanations[row_index] = explanation
+                if cache_keys[row_index] is not None:
+                    explanation_cache.put(cache_keys[row_index], explanation)
+
+        return [dict(explanation) for explanation in explanations]
 
     except Exception as e:
-        print(f"Error in SHAP explanation: {str(e)}")
-        return {
-            'interpretation': 'Feature importance analysis unavailable',
-            'feature_importance': {}
-        }
+        print(f"Error in {explanation_mode} explanation: {str(e)}")
+        return [
+            {
+                'interpretation': 'Feature importance analysis unavailable',
+                'feature_importance': {}
+            }
+            for _ in range(len(scaled_data))
+        ]
+
+
+def register_pending_explanation(scaled_row, predicted_class, bundle=None):
+    """
+    Store a scored row for an on-demand explanation and return its explanation ID.
+    The oldest rows are overwritten once MAX_PENDING_EXPLANATIONS are stored.
+    """
+    return pending_explanations.add(scaled_row, predicted_class, (bundle or _bundle).fingerprint())
+
+
+def get_explanation(explanation_id, explanation_mode='shap'):
+    """
+    Explain a row scored in deferred mode.
+    The row may have been scored by any worker process; repeated requests are answered
+    from explanation_cache. Returns None if the ID is unknown or has been overwritten.
+    """
+    if explanation_mode not in ('shap', 'fast'):
+        raise ValueError(f"Unsupported on-demand explanation mode: {explanation_mode}")
+
+    # Rows scored by a model that has since been replaced cannot be explained consistently
+    bundle = get_bundle()
+    entry = pending_explanations.get(explanation_id, bundle.fingerprint())
+    if entry is None:
+        return None
+    scaled_row, predicted_class, first_request = entry
+
+    prediction = get_classes(bundle=bundle)[predicted_class]
+    explanation = explain_predictions(
+        scaled_data=scaled_row[np.newaxis, :],
+        predicted_classes=np.array([predicted_class]),
+        explanation_mode=explanation_mode,
+        bundle=bundle
+    )[0]
+
+    # Count the influential features once per row, as the eager modes do
+    if first_request:
+        record_attack_features(prediction, explanation.get('feature_importance', {}))
+
+    result = {
+        'explanation_id': explanation_id,
+        'prediction': prediction,
+        'recommendation': explanation.get('recommendation') or recommendation(prediction, explanation.get('feature_importance', [])),
+        'interpretation': explanation.get('interpretation', ''),
+        'feature_importance': explanation.get('feature_importance', {})
+    }
+    return result
+
 
+def explain_with_path_contributions(compiled_forest, scaled_data, model_columns, predicted_classes):
+    """
+    Generate feature importance explanations from the path contributions of the compiled forest.
+    Returns one explanation per row, in the same format as explain_with_shap.
+    """
+    contributions = compiled_forest.feature_contributions(scaled_data, predicted_classes)
+    return [
+        summarise_feature_contributions(row_contributions, model_columns, 'path contributions')
+        for row_contributions in contributions
+    ]
+
+
+def explain_with_shap(scaled_data, model_columns, predicted_classes, explainer=None):
+    """
+    Generate feature importance explanations using SHAP values for every instance.
+    predicted_classes holds the class index already predicted for each row, so the
+    forest is not traversed again here. Returns one explanation per row.
+    """
+    # Reuse the shared SHAP explainer for the Random Forest model
+    if explainer is None:
+        explainer = get_explainer()
 
+    # Calculate SHAP values for the entire batch
+    shap_values = explainer.shap_values(scaled_data)
+
+    explanations = []
+    for row_index, predicted_class in enumerate(predicted_classes):
+        shap_value_for_instance = np.ravel(select_class_shap_values(shap_values, row_index, predicted_class))
+        explanations.append(summarise_feature_contributions(shap_value_for_instance, model_columns, 'SHAP values'))
+    return explanations
+
+
+def summarise_feature_contributions(contributions, model_columns, label):
+    """
+    Turn the per-feature contributions of one instance into the top 5 positive features and their interpretation.
+    label names the kind of contribution (SHAP values or path contributions) in the interpretation text.
+    """
+    # Calculate feature importance from the contributions
+    feature_importance = {model_columns[i]: float(contributions[i]) for i in range(len(model_columns))}
+
+    # Filter for positive contributions only
+    positive_features = {feature: importance for feature, importance in feature_importance.items() if importance > 0}
+
+    # Sort features by importance and get top 5
+    sorted_positive_features = dict(sorted(
+        positive_features.items(), 
+        key=lambda x: x[1], 
+        reverse=True
+    )[:5])  # Get top 5 features
+
+    # Generate interpretation
+    interpretation = f"Top 5 Positive {label} for the instance:\n"
+    interpretation += "\n".join([
+        f"{feature}: {importance:.3f}" 
+        for feature, importance in sorted_positive_features.items()
+    ])
+
+    return {
+        'interpretation': interpretation,
+        'feature_importance': sorted_positive_features
+    }
 
 
 def recommendation(attack_type, influential_features):
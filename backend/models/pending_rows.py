@@ -0,0 +1,103 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+from .shared_stats import shared_memory, open_shared_segment, initialise_header, _FileLock, _NoLock
+
+# Marks an initialised pending rows segment
+SEGMENT_MAGIC = 0x50454E44524F5731
+HEADER_SIZE = 5  # magic, capacity, features, instance token, last sequence number
+SLOT_META_SIZE = 4  # sequence number, predicted class, model fingerprint, explained flag
+
+
+class SharedPendingRows:
+    """
+    Ring buffer of scored rows kept for on-demand explanations, shared by every worker process.
+
+    Each stored row gets the next sequence number and the slot sequence % capacity, so the
+    oldest rows are overwritten once capacity rows are stored. The row's ID holds the
+    segment's instance token and the sequence number; a lookup finds the slot directly
+    and only matches while the slot still holds that sequence number. Rows are written and
+    read under the segment's file lock, so any worker can explain a row scored by another.
+
+    With shared=True the buffer is placed in a named POSIX shared memory segment that
+    workers create or attach to; otherwise it is private to the process.
+    """
+
+    def __init__(self, n_features, capacity=10000, shared=True, name=None):
+        self.n_features = n_features
+        self.capacity = capacity
+
+        n_values = HEADER_SIZE + capacity * (SLOT_META_SIZE + n_features)
+        layout = [SEGMENT_MAGIC, capacity, n_features]
+        self._shm = None
+        self._lock_path = None
+        if shared and shared_memory is not None:
+            name = name or self.default_segment_name()
+            self._lock_path = os.path.join('/tmp', f"{name}.lock")
+            self._shm, values = open_shared_segment(name, n_values, layout, self._lock_path)
+        else:
+            values = np.zeros(n_values, dtype=np.int64)
+            initialise_header(values, layout)
+
+        self._header = values[:HEADER_SIZE]
+        self._meta = values[HEADER_SIZE:HEADER_SIZE + capacity * SLOT_META_SIZE].reshape(capacity, SLOT_META_SIZE)
+        self._rows = values[HEADER_SIZE + capacity * SLOT_META_SIZE:].view(np.float64).reshape(capacity, n_features)
+        self._thread_lock = threading.Lock()
+
+    def default_segment_name(self):
+        """
+        Segment name derived from the buffer's shape, so different layouts never collide.
+        """
+        layout = f"{self.capacity}x{self.n_features}"
+        return f"projectv2_pending_{hashlib.sha1(layout.encode()).hexdigest()[:12]}"
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock, (_FileLock(self._lock_path) if self._lock_path else _NoLock()):
+            yield
+
+    @staticmethod
+    def _fingerprint_value(fingerprint):
+        # The first 60 bits of the hex digest fit an int64 slot
+        return int(fingerprint[:15], 16)
+
+    def add(self, scaled_row, predicted_class, fingerprint):
+        """
+        Store a scaled row with its predicted class and the fingerprint of the model that
+        scored it. Returns the row's ID.
+        """
+        with self._locked():
+            sequence = int(self._header[4]) + 1
+            self._header[4] = sequence
+            slot = sequence % self.capacity
+            self._meta[slot] = (sequence, int(predicted_class), self._fingerprint_value(fingerprint), 0)
+            self._rows[slot] = scaled_row
+        return f"{int(self._header[3]):x}-{sequence:x}"
+
+    def get(self, row_id, fingerprint):
+        """
+        Look a row up by ID. Returns the scaled row, its predicted class and whether it is
+        explained for the first time, or None if the ID is unknown, the row has been
+        overwritten, or it was scored by a model with a different fingerprint.
+        """
+        try:
+            token, sequence = (int(part, 16) for part in row_id.split('-'))
+        except ValueError:
+            return None
+        if token != int(self._header[3]) or sequence < 1:
+            return None
+
+        slot = sequence % self.capacity
+        with self._locked():
+            meta = self._meta[slot]
+            if int(meta[0]) != sequence or int(meta[2]) != self._fingerprint_value(fingerprint):
+                return None
+            first_request = not meta[3]
+            meta[3] = 1
+            return self._rows[slot].copy(), int(meta[1]), first_request
+
+    def __len__(self):
+        return min(int(self._header[4]), self.capacity)
@@ -0,0 +1,245 @@
+import hashlib
+import os
+import threading
+import numpy as np
+
+try:
+    import fcntl
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:  # Platforms without POSIX shared memory fall back to per-process counters
+    fcntl = None
+    shared_memory = None
+
+# Marks an initialised statistics segment
+SEGMENT_MAGIC = 0x5354415453303031
+HEADER_SIZE = 5  # magic, shards, attack types, features, instance token
+
+
+def _pid_alive(pid):
+    """
+    Check whether a process still exists.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def initialise_header(values, layout):
+    """
+    Zero a segment and write its layout followed by a random instance token.
+    The magic value (layout[0]) is written last, marking the segment as ready.
+    """
+    values[:] = 0
+    values[len(layout)] = int.from_bytes(os.urandom(6), 'little')
+    values[1:len(layout)] = layout[1:]
+    values[0] = layout[0]
+
+
+def open_shared_segment(name, n_values, layout, lock_path):
+    """
+    Create the named int64 segment, or attach to it if another worker already did, and
+    return it with its values array. The header holds layout, then an instance token.
+
+    Creating and initialising happen under the file lock at lock_path, so a process that
+    attaches meanwhile waits for the lock and never sees a half-written header. A segment
+    still without its magic value (its creator died before initialising it) is initialised
+    by whoever attaches next. The segment is kept when workers exit so restarted workers
+    keep its contents.
+    """
+    with _FileLock(lock_path):
+        try:
+            segment = shared_memory.SharedMemory(name=name, create=True, size=n_values * 8)
+        except FileExistsError:
+            segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, 'shared_memory')
+
+        values = np.ndarray((n_values,), dtype=np.int64, buffer=segment.buf)
+        if values[0] != layout[0]:
+            initialise_header(values, layout)
+        elif list(values[:len(layout)]) != list(layout):
+            raise ValueError(f"Shared memory segment {name} has a different layout")
+    return segment, values
+
+
+class SharedAttackStats:
+    """
+    Attack type x feature frequency counters shared by every worker process.
+
+    The counters live in one int64 array, split into shards. Every writing OS thread owns
+    one shard, so increments are plain array updates without locks or contention, and
+    a read sums all shards. Shards are keyed by native thread ID rather than thread
+    identity, so the greenlets of a gevent worker share their OS thread's shard instead
+    of each claiming one. Each shard has a sequence number that is odd while its
+    owner is writing, which lets readers retry until they see a consistent snapshot.
+
+    With shared=True the array is placed in a named POSIX shared memory segment that
+    workers create or attach to; otherwise it is private to the process.
+    """
+
+    def __init__(self, attack_types, features, shared=True, name=None, n_shards=256):
+        self.attack_types = list(attack_types)
+        self.features = list(features)
+        self._attack_index = {attack_type: i for i, attack_type in enumerate(self.attack_types)}
+        self._feature_index = {feature: i for i, feature in enumerate(self.features)}
+        self.n_shards = n_shards
+
+        n_values = HEADER_SIZE + 2 * n_shards + n_shards * len(self.attack_types) * len(self.features)
+        layout = [SEGMENT_MAGIC, n_shards, len(self.attack_types), len(self.features)]
+        self._shm = None
+        self._lock_path = None
+        if shared and shared_memory is not None:
+            name = name or self.default_segment_name()
+            self._lock_path = os.path.join('/tmp', f"{name}.lock")
+            self._shm, values = open_shared_segment(name, n_values, layout, self._lock_path)
+        else:
+            values = np.zeros(n_values, dtype=np.int64)
+            initialise_header(values, layout)
+
+        header = values[:HEADER_SIZE]
+        self._header = header
+        self._owners = values[HEADER_SIZE:HEADER_SIZE + n_shards]
+        self._sequences = values[HEADER_SIZE + n_shards:HEADER_SIZE + 2 * n_shards]
+        self._counts = values[HEADER_SIZE + 2 * n_shards:].reshape(
+            n_shards, len(self.attack_types), len(self.features)
+        )
+
+        self._claim_lock = threading.Lock()
+        self._thread_shards = {}  # native thread ID -> shard, for this process
+        self._process_id = os.getpid()
+
+    def default_segment_name(self):
+        """
+        Segment name derived from the attack types and features, so different layouts never collide.
+        """
+        layout = "|".join(self.attack_types) + "#" + "|".join(self.features)
+        return f"projectv2_stats_{hashlib.sha1(layout.encode()).hexdigest()[:12]}"
+
+    def __contains__(self, attack_type):
+        return attack_type in self._attack_index
+
+    def _shard(self):
+        """
+        Return the shard owned by the current OS thread, claiming one on first use.
+        """
+        shard = self._thread_shards.get(threading.get_native_id())
+        if shard is None or self._process_id != os.getpid():
+            shard = self._claim_shard()
+        return shard
+
+    def _claim_shard(self):
+        """
+        Claim a shard for the current OS thread.
+        Shards of finished threads in this process are reused first, then free shards or
+        shards left behind by dead processes. Their counts are kept, only the writer changes.
+        """
+        native_id = threading.get_native_id()
+        with self._claim_lock:
+            if self._process_id != os.getpid():
+                # Forked child: the parent's threads and shards are not ours
+                self._thread_shards = {}
+                self._process_id = os.getpid()
+            if native_id in self._thread_shards:
+                return self._thread_shards[native_id]
+
+            live_ids = {thread.native_id for thread in threading.enumerate()} | {native_id}
+            for thread_id, shard in list(self._thread_shards.items()):
+                if thread_id not in live_ids:
+                    del self._thread_shards[thread_id]
+                    self._thread_shards[native_id] = shard
+                    return shard
+
+            with self._segment_lock():
+                for shard in range(self.n_shards):
+                    owner = int(self._owners[shard])
+                    if owner == 0 or (owner != self._process_id and not _pid_alive(owner)):
+                        self._owners[shard] = self._process_id
+                        self._thread_shards[native_id] = shard
+                        return shard
+        raise RuntimeError("No free attack statistics shard, increase n_shards")
+
+    def _segment_lock(self):
+        """
+        Cross-process lock used only while claiming shards.
+        """
+        return _FileLock(self._lock_path) if self._lock_path else _NoLock()
+
+    def record(self, attack_type, features):
+        """
+        Count one occurrence of every feature for the attack type.
+        Returns False when the attack type is not tracked.
+        """
+        attack_index = self._attack_index.get(attack_type)
+        if attack_index is None:
+            return False
+        feature_indices = [self._feature_index[feature] for feature in features if feature in self._feature_index]
+        if not feature_indices:
+            return False
+
+        shard = self._shard()
+        self._sequences[shard] += 1  # Odd while the shard is being written
+        self._counts[shard, attack_index, feature_indices] += 1
+        self._sequences[shard] += 1
+        return True
+
+    def snapshot(self, max_retries=10):
+        """
+        Sum every shard into a consistent (attack types, features) array of counts and its version.
+        """
+        for _ in range(max_retries):
+            before = self._sequences.copy()
+            if np.any(before % 2):
+                continue
+            totals = self._counts.sum(axis=0)
+            if np.array_equal(before, self._sequences):
+                return totals, int(before.sum() // 2)
+        # Writers kept the shards busy; return the latest, possibly mid-update, view
+        return self._counts.sum(axis=0), int(self._sequences.sum() // 2)
+
+    def version(self):
+        """
+        Opaque version that changes on every update and across segment re-creation.
+        """
+        return f"{int(self._header[4]):x}-{int(self._sequences.sum() // 2)}"
+
+    def as_dict(self):
+        """
+        Get the non-zero counts as {attack type: {feature: count}}.
+        """
+        totals, _ = self.snapshot()
+        return {
+            attack_type: {
+                self.features[feature_index]: int(totals[attack_index, feature_index])
+                for feature_index in np.flatnonzero(totals[attack_index])
+            }
+            for attack_index, attack_type in enumerate(self.attack_types)
+        }
+
+
+class _FileLock:
+    """
+    Exclusive flock on a lock file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+class _NoLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
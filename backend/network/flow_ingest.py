@@ -0,0 +1,318 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+# Define the base directory of the backend (backend/) and make its modules importable
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# CICFlowMeter exports dropped here, and where their scores are written
+flow_files_path = os.path.join(BASE_DIR, 'network', 'pcap_files')
+scored_files_path = os.path.join(BASE_DIR, 'network', 'scored')
+FLOW_FILE_PATTERN = '*.pcap_Flow.csv'
+
+# CICFlowMeter column names and the model/display column each one feeds
+CIC_COLUMN_ALIASES = {
+    'Src IP': 'Source IP',
+    'Dst IP': 'Destination IP',
+    'Src Port': 'Source Port',
+    'Dst Port': 'Destination Port',
+    'Protocol': 'Protocol',
+    'Flow Duration': 'Flow Duration',
+    'Tot Fwd Pkts': 'Total Fwd Packets',
+    'Tot Bwd Pkts': 'Total Backward Packets',
+    'TotLen Fwd Pkts': 'Total Length of Fwd Packets',
+    'TotLen Bwd Pkts': 'Total Length of Bwd Packets',
+    'Fwd Pkt Len Max': 'Fwd Packet Length Max',
+    'Fwd Pkt Len Min': 'Fwd Packet Length Min',
+    'Fwd Pkt Len Mean': 'Fwd Packet Length Mean',
+    'Fwd Pkt Len Std': 'Fwd Packet Length Std',
+    'Bwd Pkt Len Max': 'Bwd Packet Length Max',
+    'Bwd Pkt Len Min': 'Bwd Packet Length Min',
+    'Bwd Pkt Len Mean': 'Bwd Packet Length Mean',
+    'Bwd Pkt Len Std': 'Bwd Packet Length Std',
+    'Flow Byts/s': 'Flow Bytes/s',
+    'Flow Pkts/s': 'Flow Packets/s',
+    'Flow IAT Mean': 'Flow IAT Mean',
+    'Flow IAT Std': 'Flow IAT Std',
+    'Flow IAT Max': 'Flow IAT Max',
+    'Flow IAT Min': 'Flow IAT Min',
+    'Fwd IAT Tot': 'Fwd IAT Total',
+    'Fwd IAT Mean': 'Fwd IAT Mean',
+    'Fwd IAT Std': 'Fwd IAT Std',
+    'Fwd IAT Max': 'Fwd IAT Max',
+    'Fwd IAT Min': 'Fwd IAT Min',
+    'Bwd IAT Tot': 'Bwd IAT Total',
+    'Bwd IAT Mean': 'Bwd IAT Mean',
+    'Bwd IAT Std': 'Bwd IAT Std',
+    'Bwd IAT Max': 'Bwd IAT Max',
+    'Bwd IAT Min': 'Bwd IAT Min',
+    'Fwd PSH Flags': 'Fwd PSH Flags',
+    'Fwd URG Flags': 'Fwd URG Flags',
+    'Fwd Header Len': 'Fwd Header Length',
+    'Bwd Header Len': 'Bwd Header Length',
+    'Fwd Pkts/s': 'Fwd Packets/s',
+    'Bwd Pkts/s': 'Bwd Packets/s',
+    'Pkt Len Min': 'Min Packet Length',
+    'Pkt Len Max': 'Max Packet Length',
+    'Pkt Len Mean': 'Packet Length Mean',
+    'Pkt Len Std': 'Packet Length Std',
+    'Pkt Len Var': 'Packet Length Variance',
+    'FIN Flag Cnt': 'FIN Flag Count',
+    'SYN Flag Cnt': 'SYN Flag Count',
+    'RST Flag Cnt': 'RST Flag Count',
+    'PSH Flag Cnt': 'PSH Flag Count',
+    'ACK Flag Cnt': 'ACK Flag Count',
+    'URG Flag Cnt': 'URG Flag Count',
+    'CWE Flag Count': 'CWE Flag Count',
+    'ECE Flag Cnt': 'ECE Flag Count',
+    'Down/Up Ratio': 'Down/Up Ratio',
+    'Pkt Size Avg': 'Average Packet Size',
+    'Fwd Seg Size Avg': 'Avg Fwd Segment Size',
+    'Bwd Seg Size Avg': 'Avg Bwd Segment Size',
+    'Subflow Fwd Pkts': 'Subflow Fwd Packets',
+    'Subflow Fwd Byts': 'Subflow Fwd Bytes',
+    'Subflow Bwd Pkts': 'Subflow Bwd Packets',
+    'Subflow Bwd Byts': 'Subflow Bwd Bytes',
+    'Init Fwd Win Byts': 'Init_Win_bytes_forward',
+    'Init Bwd Win Byts': 'Init_Win_bytes_backward',
+    'Fwd Act Data Pkts': 'act_data_pkt_fwd',
+    'Fwd Seg Size Min': 'min_seg_size_forward',
+    'Active Mean': 'Active Mean',
+    'Active Std': 'Active Std',
+    'Active Max': 'Active Max',
+    'Active Min': 'Active Min',
+    'Idle Mean': 'Idle Mean',
+    'Idle Std': 'Idle Std',
+    'Idle Max': 'Idle Max',
+    'Idle Min': 'Idle Min',
+    # Columns carried through to the output unchanged
+    'Flow ID': 'Flow ID',
+    'Timestamp': 'Timestamp',
+    'Label': 'Label'
+}
+
+# Case and whitespace-insensitive lookup, compiled once; the model's own names map to themselves
+_ALIAS_LOOKUP = {name.strip().lower(): target for name, target in CIC_COLUMN_ALIASES.items()}
+_ALIAS_LOOKUP.update({target.strip().lower(): target for target in CIC_COLUMN_ALIASES.values()})
+
+# IANA protocol numbers used by CICFlowMeter
+PROTOCOL_NAMES = {1: 'ICMP', 6: 'TCP', 17: 'UDP'}
+
+# Columns written for every scored flow, besides the carried-through ones
+OUTPUT_COLUMNS = [
+    'Source IP', 'Destination IP', 'Source Port', 'Protocol', 'prediction', 'confidence_score',
+    'recommendation', 'interpretation', 'feature_importance', 'traffic_stats'
+]
+CARRIED_COLUMNS = ['Flow ID', 'Timestamp', 'Label']
+
+# Every other recognised column holds a number
+TEXT_COLUMNS = {'Source IP', 'Destination IP', 'Protocol'} | set(CARRIED_COLUMNS)
+
+
+def is_cic_export(columns):
+    """
+    Whether a header uses CICFlowMeter's own column names (Tot Fwd Pkts, Flow Byts/s, ...),
+    i.e. holds raw flow features rather than the replay dataset's standardized ones.
+    """
+    return any(
+        name in CIC_COLUMN_ALIASES and CIC_COLUMN_ALIASES[name] != name
+        for name in (column.strip() for column in columns)
+    )
+
+
+def build_column_map(columns):
+    """
+    Map a flow file's header onto model and display column names.
+    Returns {file column: target column} for every recognised column.
+    """
+    column_map = {}
+    for column in columns:
+        target = _ALIAS_LOOKUP.get(column.strip().lower())
+        if target is not None and target not in column_map.values():
+            column_map[column] = target
+    return column_map
+
+
+def normalise_chunk(chunk, column_map):
+    """
+    Rename a chunk of CICFlowMeter rows to model column names and clean the values
+    the scaler cannot take (infinite rates, missing values, text in a numeric column,
+    which become 0). The values stay raw; score_chunk standardizes them.
+    """
+    chunk = chunk.rename(columns=column_map)
+    numeric_columns = [column for column in chunk.columns if column not in TEXT_COLUMNS]
+    chunk[numeric_columns] = chunk[numeric_columns].apply(pd.to_numeric, errors='coerce')
+    # CICIDS2017 repeats the forward header length; the model was trained with both copies
+    if 'Fwd Header Length' in chunk:
+        chunk['Fwd Header Length Extra'] = chunk['Fwd Header Length']
+        numeric_columns.append('Fwd Header Length Extra')
+    if 'Protocol' in chunk:
+        # Protocol numbers become names; names (as in the replay dataset) are kept
+        numbers = pd.to_numeric(chunk['Protocol'], errors='coerce')
+        chunk['Protocol'] = chunk['Protocol'].astype(str).where(
+            numbers.isna(), numbers.map(lambda number: PROTOCOL_NAMES.get(number, str(int(number))), na_action='ignore')
+        )
+
+    chunk[numeric_columns] = chunk[numeric_columns].replace([np.inf, -np.inf], np.nan).fillna(0)
+    for column, default in (('Source IP', ''), ('Destination IP', ''), ('Source Port', 0), ('Protocol', '')):
+        if column not in chunk:
+            chunk[column] = default
+    return chunk.reset_index(drop=True)
+
+
+def iter_flow_chunks(path, chunk_size=10000):
+    """
+    Read a flow file in chunks of chunk_size rows, normalised for scoring.
+    Only the recognised columns are parsed.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    column_map = build_column_map(header)
+    for chunk in pd.read_csv(path, usecols=list(column_map), chunksize=chunk_size):
+        if len(chunk):
+            yield normalise_chunk(chunk, column_map)
+
+
+def standardize_chunk(chunk):
+    """
+    Replace the raw model features of a normalised chunk by standardized values, the form
+    process_network_traffic expects (the replay dataset is stored standardized).
+    """
+    from models.nn_model import model_columns, standardize_features
+
+    other_columns = chunk.drop(columns=[column for column in model_columns if column in chunk])
+    return pd.concat([other_columns, standardize_features(chunk)], axis=1)
+
+
+def score_chunk(chunk, explanation_mode='none'):
+    """
+    Score a normalised chunk of raw flows.
+    traffic_stats shows the flows' own values rather than values unscaled again.
+    Returns the processed DataFrame, or None if scoring failed.
+    """
+    from models.nn_model import process_network_traffic, raw_traffic_stats
+
+    processed = process_network_traffic(standardize_chunk(chunk), explanation_mode=explanation_mode)
+    if processed is not None:
+        processed['traffic_stats'] = raw_traffic_stats(chunk)
+    return processed
+
+
+def scored_records(chunk, processed):
+    """
+    Flatten a scored chunk into output rows, with the nested fields as JSON.
+    """
+    output = processed[[column for column in OUTPUT_COLUMNS if column in processed]].copy()
+    for column in ('feature_importance', 'traffic_stats'):
+        if column in output:
+            output[column] = output[column].map(json.dumps)
+    for column in reversed(CARRIED_COLUMNS):
+        if column in chunk:
+            output.insert(0, column, chunk[column].to_numpy())
+    return output
+
+
+def score_flow_file(path, output_path, chunk_size=10000, explanation_mode='none'):
+    """
+    Score a flow file chunk by chunk, appending each chunk's results to output_path.
+    Memory use depends on chunk_size, not on the size of the file.
+    Returns the number of rows scored and the count of each prediction.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    predictions = Counter()
+    rows = 0
+    first_chunk = True
+    for chunk in iter_flow_chunks(path, chunk_size):
+        processed = score_chunk(chunk, explanation_mode)
+        if processed is None:
+            raise RuntimeError(f"Scoring failed for rows {rows}-{rows + len(chunk)} of {path}")
+
+        scored_records(chunk, processed).to_csv(output_path, mode='w' if first_chunk else 'a', header=first_chunk, index=False)
+        first_chunk = False
+        predictions.update(processed['prediction'])
+        rows += len(chunk)
+    return rows, predictions
+
+
+def check_flow_file(path, rows=20):
+    """
+    Score the first rows of a flow file and check the results are plausible: the displayed
+    destination port is the flow's own, and every prediction is a class the model knows.
+    Returns the number of rows checked (0 for a file without flows).
+    Raises ValueError when a check fails.
+    """
+    from models.nn_model import le
+
+    chunk = next(iter_flow_chunks(path, rows), None)
+    if chunk is None:
+        return 0
+    processed = score_chunk(chunk)
+    if processed is None:
+        raise ValueError(f"Scoring the first rows of {path} failed")
+
+    displayed_ports = [stats['Destination Port'] for stats in processed['traffic_stats']]
+    if 'Destination Port' in chunk and displayed_ports != chunk['Destination Port'].astype(int).tolist():
+        raise ValueError(f"Displayed destination ports {displayed_ports[:5]} do not match the flows in {path}")
+    unknown_classes = set(processed['prediction']) - {str(label) for label in le.classes_}
+    if unknown_classes:
+        raise ValueError(f"Unknown predictions {sorted(unknown_classes)} for {path}")
+    return len(chunk)
+
+
+def scored_path_for(path, output_dir=scored_files_path):
+    """
+    Path of the scores written for a flow file.
+    """
+    name = os.path.basename(path)
+    if name.endswith('.csv'):
+        name = name[:-len('.csv')]
+    return os.path.join(output_dir, name + '.scored.csv')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score CICFlowMeter flow exports in fixed-size chunks.")
+    parser.add_argument('paths', nargs='*', default=[os.path.join(flow_files_path, FLOW_FILE_PATTERN)],
+                        help="Flow CSV files or glob patterns (default: network/pcap_files/*.pcap_Flow.csv)")
+    parser.add_argument('--output-dir', default=scored_files_path, help="Directory for the .scored.csv results")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Rows read and scored at a time")
+    parser.add_argument('--explain', default='none', choices=['shap', 'fast', 'none'], help="Explanation mode")
+    parser.add_argument('--check', action='store_true',
+                        help="Only score the first rows of each file and check ports and classes are plausible")
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.paths for path in glob.glob(pattern)})
+    if not paths:
+        raise SystemExit("No flow files found")
+
+    # Offline scoring must not count towards the live dashboard's feature statistics;
+    # the ingest daemon, which feeds the dashboard, keeps the shared counters
+    os.environ.setdefault('ATTACK_STATS_BACKEND', 'local')
+
+    if args.check:
+        for path in paths:
+            checked = check_flow_file(path)
+            print(f"{os.path.basename(path)}: " + (f"{checked} rows ok" if checked else "no flows"))
+        return
+
+    for path in paths:
+        start = time.perf_counter()
+        output_path = scored_path_for(path, args.output_dir)
+        rows, predictions = score_flow_file(path, output_path, args.chunk_size, args.explain)
+        elapsed = time.perf_counter() - start
+        if rows == 0:
+            print(f"{os.path.basename(path)}: no flows")
+            continue
+        summary = ", ".join(f"{label}: {count}" for label, count in predictions.most_common())
+        print(f"{os.path.basename(path)}: {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s) [{summary}]")
+        print(f"  Scores written to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,103 @@
+import argparse
 import os
+import time
+import numpy as np
 import pandas as pd
-import random
+from replay_store import convert_csv_to_store, store_path_for
 
 # Define the base directory of the current file (backend/)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Construct the path to the network_data.csv file
 network_data_path = os.path.join(BASE_DIR, '..', 'network', 'test_data.csv')
+enhanced_data_path = os.path.join(BASE_DIR, '..', 'network', 'test_data_with_network_info.csv')
 
-# Check if the file exists
-if not os.path.exists(network_data_path):
-    print(f"File not found at: {network_data_path}")
-    print("Please check the file path and ensure the file exists.")
-else:
-    # Load the network dataset
-    network_data = pd.read_csv(network_data_path)
-    print("Dataset loaded successfully!")
-
-    # Helper functions to generate random data
-    def random_ip():
-        """Generate a random IP address."""
-        return ".".join(str(random.randint(1, 254)) for _ in range(4))
-
-    def random_source_port():
-        """Generate a random source port."""
-        return random.randint(1024, 65535)
-
-    def determine_protocol(dport):
-        """Determine the protocol type based on destination port."""
-        if dport in [80, 443, 22]:  # HTTP, HTTPS, SSH
-            return "TCP"
-        elif dport == 53:  # DNS
-            return "UDP"
-        else:
-            return "TCP" if random.random() > 0.5 else "UDP"
-
-    def generate_network_data():
-        """Generate network data with all required columns."""
-        # Add new network information columns
-        network_data['Source IP'] = [random_ip() for _ in range(len(network_data))]
-        network_data['Destination IP'] = [random_ip() for _ in range(len(network_data))]
-        network_data['Source Port'] = [random_source_port() for _ in range(len(network_data))]
-        network_data['Protocol'] = network_data['Destination Port'].apply(determine_protocol)
-        
-        # Reorder columns to place network information first
-        columns = ['Source IP', 'Destination IP', 'Source Port', 'Destination Port', 'Protocol'] + \
-                 [col for col in network_data.columns if col not in ['Source IP', 'Destination IP', 
-                                                                    'Source Port', 'Destination Port', 'Protocol']]
-        
-        return network_data[columns]
-
-    # Generate the enhanced network data
-    enhanced_network_data = generate_network_data()
-    
-    # Save the enhanced data to a new file
-    enhanced_data_path = os.path.join(BASE_DIR, '..', 'network', 'test_data_with_network_info.csv')
-    enhanced_network_data.to_csv(enhanced_data_path, index=False)
-    print(f"Enhanced network data saved to: {enhanced_data_path}")
+NETWORK_COLUMNS = ['Source IP', 'Destination IP', 'Source Port', 'Destination Port', 'Protocol']
+
+# Decimal text of every octet value, looked up instead of formatting each address
+OCTET_STRINGS = np.array([str(value) for value in range(256)], dtype=object)
+
+
+def random_ips(rng, n):
+    """Generate n random IPv4 addresses as uint32, every octet between 1 and 254."""
+    octets = rng.integers(1, 255, size=(n, 4), dtype=np.uint32)
+    return (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+
+
+def format_ips(addresses):
+    """Format uint32 IPv4 addresses as dotted-quad strings."""
+    addresses = np.asarray(addresses, dtype=np.uint32)
+    first, second, third, fourth = (OCTET_STRINGS[(addresses >> shift) & 0xFF] for shift in (24, 16, 8, 0))
+    return first + '.' + second + '.' + third + '.' + fourth
+
+
+def random_source_ports(rng, n):
+    """Generate n random ephemeral source ports."""
+    return rng.integers(1024, 65536, size=n)
+
+
+def determine_protocols(rng, destination_ports):
+    """Determine the protocol type based on destination port."""
+    destination_ports = np.asarray(destination_ports)
+    return np.select(
+        [np.isin(destination_ports, [80, 443, 22]), destination_ports == 53],  # HTTP, HTTPS, SSH; DNS
+        ['TCP', 'UDP'],
+        default=np.where(rng.random(len(destination_ports)) > 0.5, 'TCP', 'UDP')
+    )
+
+
+def add_network_columns(chunk, rng):
+    """Add the network information columns to a chunk and place them first."""
+    chunk['Source IP'] = format_ips(random_ips(rng, len(chunk)))
+    chunk['Destination IP'] = format_ips(random_ips(rng, len(chunk)))
+    chunk['Source Port'] = random_source_ports(rng, len(chunk))
+    chunk['Protocol'] = determine_protocols(rng, chunk['Destination Port'].to_numpy())
+
+    # Reorder columns to place network information first
+    return chunk[NETWORK_COLUMNS + [col for col in chunk.columns if col not in NETWORK_COLUMNS]]
+
+
+def generate_network_data(input_path, output_path, seed=0, chunk_size=200000, write_store=True):
+    """
+    Generate network data with all required columns, one chunk of the input at a time.
+    The same seed and chunk size always produce the same output.
+    Returns the number of rows written.
+    """
+    rng = np.random.default_rng(seed)
+    rows = 0
+    for chunk in pd.read_csv(input_path, chunksize=chunk_size):
+        enhanced_chunk = add_network_columns(chunk, rng)
+        enhanced_chunk.to_csv(output_path, mode='a' if rows else 'w', header=not rows, index=False)
+        rows += len(enhanced_chunk)
+
+    if write_store:
+        # Convert the finished CSV into a memory-mappable columnar store for faster loading,
+        # a few columns at a time rather than keeping every chunk in memory
+        convert_csv_to_store(output_path, store_path_for(output_path))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add random network information to the replay dataset.")
+    parser.add_argument('--input', default=network_data_path, help="Dataset with a 'Destination Port' column")
+    parser.add_argument('--output', default=enhanced_data_path, help="Where to write the enhanced dataset")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--chunk-size', type=int, default=200000, help="Rows generated at a time")
+    parser.add_argument('--no-store', action='store_true', help="Do not write the columnar replay store")
+    args = parser.parse_args()
+
+    # Check if the file exists
+    if not os.path.exists(args.input):
+        print(f"File not found at: {args.input}")
+        print("Please check the file path and ensure the file exists.")
+        return
+
+    start = time.perf_counter()
+    rows = generate_network_data(args.input, args.output, args.seed, args.chunk_size, not args.no_store)
+    print(f"Enhanced network data ({rows} rows, {time.perf_counter() - start:.1f}s) saved to: {args.output}")
+    if not args.no_store:
+        print(f"Columnar replay store saved to: {store_path_for(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import fcntl
+import glob
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+
+# Define the base directory of the backend (backend/) and make its modules importable
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from network.flow_ingest import flow_files_path, FLOW_FILE_PATTERN, build_column_map, normalise_chunk, score_chunk
+
+# Held while a daemon is ingesting, so two daemons never score the same rows
+ingest_lock_path = os.path.join(tempfile.gettempdir(), 'projectv2_ingest.lock')
+
+
+def read_complete_lines(path, offset, max_rows):
+    """
+    Read up to max_rows complete lines of a file starting at byte offset.
+    A last line still being written (no trailing newline) is left for the next read.
+    Returns the lines and the offset just after the last one.
+    """
+    lines = []
+    with open(path, 'rb') as flow_file:
+        flow_file.seek(offset)
+        while len(lines) < max_rows:
+            line = flow_file.readline()
+            if not line.endswith(b'\n'):
+                break
+            lines.append(line)
+            offset += len(line)
+    return lines, offset
+
+
+def parse_flow_lines(lines, header):
+    """
+    Parse raw CSV lines of a flow file into a chunk normalised for scoring.
+    Only the recognised columns are read, and values that are not numbers become 0, so
+    one malformed row never holds back the rows after it.
+    """
+    columns = pd.read_csv(io.StringIO(header), nrows=0).columns
+    column_map = build_column_map(columns)
+    chunk = pd.read_csv(io.BytesIO(b''.join(lines)), header=None, names=list(columns), usecols=list(column_map))
+    return normalise_chunk(chunk, column_map)
+
+
+def ingested_flows(chunk, processed, source_file):
+    """
+    Build the database rows for a scored chunk.
+    """
+    from model import IngestedFlow
+
+    flows = []
+    for position, record in enumerate(processed.to_dict(orient='records')):
+        flows.append(IngestedFlow(
+            source_file=source_file,
+            flow_id=str(chunk['Flow ID'].iat[position]) if 'Flow ID' in chunk else None,
+            timestamp=str(chunk['Timestamp'].iat[position]) if 'Timestamp' in chunk else None,
+            attack_type=record['prediction'],
+            confidence=float(record['confidence_score']),
+            recommendation=record['recommendation'],
+            interpretation=record.get('interpretation'),
+            feature_importance=record.get('feature_importance', {}),
+            traffic_stats=record.get('traffic_stats', {}),
+            source_ip=str(record['Source IP']),
+            destination_ip=str(record['Destination IP']),
+            protocol=str(record['Protocol']),
+            source_port=int(record['Source Port'])
+        ))
+    return flows
+
+
+class FlowIngestDaemon:
+    """
+    Tail the CICFlowMeter exports in a directory and score their new rows as they appear.
+
+    Each poll reads the complete lines past a file's checkpointed byte offset, scores them
+    in batches of batch_size with process_network_traffic, and stores the results and the
+    new offset in one transaction. A batch that fails is retried on the next poll. After a restart ingestion resumes from the stored
+    offsets, so no row is scored twice or skipped. A file that shrinks or is replaced
+    (new inode) is read again from the start.
+    """
+
+    def __init__(self, directory=flow_files_path, pattern=FLOW_FILE_PATTERN, batch_size=500,
+                 poll_interval=2.0, explanation_mode='fast'):
+        self.directory = directory
+        self.pattern = pattern
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.explanation_mode = explanation_mode
+        self.rows_ingested = 0
+        self.batches_failed = 0
+
+    def poll(self):
+        """
+        Ingest everything new in the watched files once.
+        Returns the number of rows ingested.
+        """
+        rows = 0
+        for path in sorted(glob.glob(os.path.join(self.directory, self.pattern))):
+            try:
+                rows += self.ingest_file(path)
+            except Exception as e:
+                logging.error(f"Error ingesting {path}: {e}")
+        return rows
+
+    def ingest_file(self, path):
+        """
+        Ingest the new complete rows of one file, one batch per transaction.
+        """
+        from database import SessionLocal
+        from model import IngestCheckpoint
+
+        source_file = os.path.basename(path)
+        rows = 0
+        db = SessionLocal()
+        try:
+            checkpoint = db.get(IngestCheckpoint, source_file)
+            if checkpoint is None:
+                checkpoint = IngestCheckpoint(path=source_file, offset=0, rows=0)
+                db.add(checkpoint)
+
+            file_stat = os.stat(path)
+            if checkpoint.inode != file_stat.st_ino or file_stat.st_size < checkpoint.offset:
+                # New or replaced file: start again from its header
+                checkpoint.inode = file_stat.st_ino
+                checkpoint.offset = 0
+                checkpoint.header = None
+                checkpoint.rows = 0
+
+            if checkpoint.header is None:
+                lines, offset = read_complete_lines(path, 0, 1)
+                if not lines:
+                    db.commit()
+                    return 0
+                checkpoint.header = lines[0].decode('utf-8-sig').strip()
+                checkpoint.offset = offset
+                db.commit()
+
+            while checkpoint.offset < file_stat.st_size:
+                lines, offset = read_complete_lines(path, checkpoint.offset, self.batch_size)
+                if not lines:
+                    break
+                try:
+                    flows = self.score_lines(lines, checkpoint.header, source_file, checkpoint.offset)
+                except Exception as e:
+                    # Keep the checkpoint before this batch so the next poll retries it
+                    logging.error(str(e))
+                    break
+                db.add_all(flows)
+                checkpoint.offset = offset
+                checkpoint.rows += len(flows)
+                db.commit()
+                rows += len(flows)
+            return rows
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+            self.rows_ingested += rows
+
+    def score_lines(self, lines, header, source_file, offset):
+        """
+        Score a batch of raw lines and return their database rows.
+        Raises if the batch cannot be parsed or scored; its checkpoint is then left where
+        it is and the batch is retried on the next poll.
+        """
+        try:
+            chunk = parse_flow_lines(lines, header)
+            processed = score_chunk(chunk, self.explanation_mode)
+            if processed is None:
+                raise RuntimeError("scoring failed")
+        except Exception as e:
+            self.batches_failed += 1
+            raise RuntimeError(f"Could not score {len(lines)} rows of {source_file} at byte {offset}, will retry: {e}") from e
+        return ingested_flows(chunk, processed, source_file)
+
+    def run(self):
+        """
+        Poll forever, sleeping poll_interval seconds whenever there is nothing new.
+        """
+        with open(ingest_lock_path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise SystemExit(f"Another ingest daemon holds {ingest_lock_path}")
+
+            logging.info(f"Watching {os.path.join(self.directory, self.pattern)} for new flows")
+            while True:
+                rows = self.poll()
+                if rows:
+                    logging.info(f"Ingested {rows} flows ({self.rows_ingested} in total)")
+                else:
+                    time.sleep(self.poll_interval)
+
+
+def main():
+    from database import init_db
+    import model  # noqa: F401 - registers the ingest tables before they are created
+
+    parser = argparse.ArgumentParser(
+        description="Score new rows of CICFlowMeter exports as they are written and store them in the "
+                    "ingested_flows table. The web app streams them with LIVE_TRAFFIC_SOURCE=ingest."
+    )
+    parser.add_argument('--directory', default=flow_files_path, help="Directory of flow CSV files to watch")
+    parser.add_argument('--pattern', default=FLOW_FILE_PATTERN, help="File name pattern of the flow files")
+    parser.add_argument('--batch-size', type=int, default=500, help="Rows scored per transaction")
+    parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds between polls when idle")
+    parser.add_argument('--explain', default=os.getenv('INGEST_EXPLANATION_MODE', 'fast'),
+                        choices=['shap', 'fast', 'none'], help="Explanation mode")
+    parser.add_argument('--once', action='store_true', help="Ingest what is there now and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    init_db()
+    daemon = FlowIngestDaemon(args.directory, args.pattern, args.batch_size, args.poll_interval, args.explain)
+    if args.once:
+        print(f"Ingested {daemon.poll()} flows")
+    else:
+        daemon.run()
+
+
+if __name__ == "__main__":
+    main()
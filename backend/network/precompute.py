@@ -0,0 +1,136 @@
+import argparse
+import os
+import sys
+import time
+import joblib
+from concurrent.futures import ProcessPoolExecutor
+
+# Define the base directory of the backend (backend/) and make its modules importable
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from network.replay_store import load_traffic_data
+
+# Default replay dataset and the sidecar file holding its precomputed scores
+replay_data_path = os.path.join(BASE_DIR, 'network', 'test_data_with_network_info.csv')
+
+
+def scores_path_for(data_path):
+    """
+    Path of the precomputed scores sidecar for a replay dataset.
+    """
+    return os.path.splitext(data_path)[0] + '.scores.pkl'
+
+
+def _source_size(data_path):
+    """
+    Size of the replay dataset file, or None when only its columnar store is deployed.
+    """
+    return os.path.getsize(data_path) if os.path.exists(data_path) else None
+
+
+def _init_worker():
+    """
+    Keep a worker's attack feature counters private, should it load the model itself.
+    """
+    os.environ['ATTACK_STATS_BACKEND'] = 'local'
+
+
+def _score_chunk(chunk, explanation_mode):
+    """
+    Score one chunk of the replay dataset in a worker process.
+    The rows are not recorded in the attack feature statistics: that happens when
+    a precomputed row is served.
+    """
+    from models.nn_model import process_network_traffic
+
+    processed = process_network_traffic(chunk, explanation_mode=explanation_mode, record_features=False)
+    if processed is None:
+        raise RuntimeError("Scoring failed for a chunk of the replay dataset")
+    return processed.to_dict(orient="records")
+
+
+def precompute_replay_scores(traffic_data, explanation_mode='shap', workers=None, chunk_size=2000):
+    """
+    Score and explain every row of the replay dataset once.
+    Chunks are scored in parallel by a process pool and the records are returned in row order.
+    """
+    chunks = [traffic_data.iloc[start:start + chunk_size] for start in range(0, len(traffic_data), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        scored_chunks = [_score_chunk(chunk, explanation_mode) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            scored_chunks = list(executor.map(_score_chunk, chunks, [explanation_mode] * len(chunks)))
+
+    return [record for chunk_records in scored_chunks for record in chunk_records]
+
+
+def current_model_fingerprint():
+    """
+    Fingerprint of the model bundle currently used for scoring.
+    """
+    from models.nn_model import get_bundle
+
+    return get_bundle().fingerprint()
+
+
+def save_replay_scores(records, data_path, model_fingerprint=None):
+    """
+    Write the precomputed records next to the replay dataset.
+    The dataset's size and row count and the model's fingerprint are stored to detect
+    a stale sidecar.
+    """
+    scores_path = scores_path_for(data_path)
+    joblib.dump({
+        'source_size': _source_size(data_path),
+        'source_rows': len(records),
+        'model_fingerprint': model_fingerprint or current_model_fingerprint(),
+        'records': records
+    }, scores_path)
+    return scores_path
+
+
+def load_replay_scores(data_path, expected_rows, model_fingerprint=None):
+    """
+    Load the precomputed records for a replay dataset.
+    Returns None if the sidecar is missing, was built from a different dataset or was
+    scored by a different model.
+    """
+    scores_path = scores_path_for(data_path)
+    if not os.path.exists(scores_path):
+        return None
+
+    scores = joblib.load(scores_path)
+    if scores['source_size'] != _source_size(data_path) or scores['source_rows'] != expected_rows:
+        print(f"Precomputed scores at {scores_path} do not match {data_path}, ignoring them")
+        return None
+    if scores.get('model_fingerprint') != (model_fingerprint or current_model_fingerprint()):
+        print(f"Precomputed scores at {scores_path} were scored by a different model, ignoring them")
+        return None
+    return scores['records']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute scores and explanations for the replay dataset.")
+    parser.add_argument('--data', default=replay_data_path, help="Replay dataset to score")
+    parser.add_argument('--explain', default='shap', choices=['shap', 'fast', 'none'], help="Explanation mode")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=2000, help="Rows scored per task")
+    args = parser.parse_args()
+
+    traffic_data = load_traffic_data(args.data)
+
+    start = time.perf_counter()
+    records = precompute_replay_scores(traffic_data, args.explain, args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    scores_path = save_replay_scores(records, args.data)
+    print(f"Scored {len(records)} rows in {elapsed:.1f}s ({len(records) / elapsed:.0f} rows/s)")
+    print(f"Precomputed scores saved to: {scores_path}")
+
+
+if __name__ == "__main__":
+    main()
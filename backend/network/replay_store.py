@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Version of the on-disk layout written by save_replay_store
+STORE_FORMAT_VERSION = 1
+
+
+def store_path_for(csv_path):
+    """
+    Path of the columnar replay store for a CSV replay dataset.
+    """
+    return os.path.splitext(csv_path)[0] + '.replay'
+
+
+def _downcast_numeric(values):
+    """
+    Shrink a numeric column to the smallest dtype that holds every value exactly.
+    """
+    if np.issubdtype(values.dtype, np.integer):
+        for dtype in (np.int8, np.int16, np.int32, np.int64):
+            info = np.iinfo(dtype)
+            if values.size == 0 or (values.min() >= info.min and values.max() <= info.max):
+                return values.astype(dtype)
+    if np.issubdtype(values.dtype, np.floating):
+        as_float32 = values.astype(np.float32)
+        if np.array_equal(as_float32.astype(values.dtype), values, equal_nan=True):
+            return as_float32
+    return values
+
+
+def _save_column(series, position, store_path):
+    """
+    Write one column as a .npy file and return its manifest entry.
+
+    Numeric columns are downcast without losing precision. Text columns with few distinct
+    values are dictionary encoded; the others are stored as fixed-width strings.
+    """
+    file_name = f"{position:04d}.npy"
+    entry = {'name': series.name, 'file': file_name}
+
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = _downcast_numeric(series.to_numpy())
+        entry['kind'] = 'numeric'
+    else:
+        text = series.astype(str)
+        codes, categories = pd.factorize(text)
+        if len(categories) <= max(1, len(text) // 2):
+            values = _downcast_numeric(codes.astype(np.int64))
+            entry['kind'] = 'category'
+            entry['categories'] = [str(category) for category in categories]
+        else:
+            values = text.to_numpy(dtype=str)
+            entry['kind'] = 'text'
+
+    np.save(os.path.join(store_path, file_name), np.ascontiguousarray(values))
+    entry['dtype'] = str(values.dtype)
+    return entry
+
+
+def _write_manifest(store_path, rows, entries):
+    with open(os.path.join(store_path, 'manifest.json'), 'w') as manifest_file:
+        json.dump({'version': STORE_FORMAT_VERSION, 'rows': rows, 'columns': entries}, manifest_file, indent=2)
+
+
+def save_replay_store(data, store_path):
+    """
+    Write a replay DataFrame as one .npy file per column plus a JSON manifest.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    entries = [_save_column(data[column], position, store_path) for position, column in enumerate(data.columns)]
+    _write_manifest(store_path, len(data), entries)
+
+
+def convert_csv_to_store(csv_path, store_path, columns_per_pass=16):
+    """
+    Write the columnar store of a CSV replay dataset, reading columns_per_pass columns of
+    the CSV at a time, so memory holds a few columns rather than the whole dataset.
+    Returns the number of rows.
+    """
+    columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    os.makedirs(store_path, exist_ok=True)
+    if os.path.exists(os.path.join(store_path, 'manifest.json')):
+        os.remove(os.path.join(store_path, 'manifest.json'))
+    rows = 0
+    entries = []
+    for first in range(0, len(columns), columns_per_pass):
+        data = pd.read_csv(csv_path, usecols=columns[first:first + columns_per_pass])
+        data.columns = data.columns.str.strip()
+        rows = len(data)
+        for column in data.columns:
+            entries.append(_save_column(data[column], len(entries), store_path))
+        del data
+    # The manifest is written last, so the store only looks complete (and newer than the CSV) once it is
+    _write_manifest(store_path, rows, entries)
+    return rows
+
+
+def load_replay_store(store_path):
+    """
+    Load a columnar replay store with every column memory mapped.
+    The returned DataFrame is read-only and shares its pages with other processes.
+    """
+    with open(os.path.join(store_path, 'manifest.json')) as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest['version'] != STORE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported replay store version {manifest['version']}")
+
+    columns = {}
+    for entry in manifest['columns']:
+        values = np.load(os.path.join(store_path, entry['file']), mmap_mode='r')
+        if entry['kind'] == 'category':
+            columns[entry['name']] = pd.Categorical.from_codes(values, categories=entry['categories'])
+        else:
+            columns[entry['name']] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_traffic_data(csv_path):
+    """
+    Load a replay dataset, preferring its columnar store over the CSV.
+    Falls back to the CSV when the store is missing, older than the CSV or unreadable.
+    """
+    store_path = store_path_for(csv_path)
+    manifest_path = os.path.join(store_path, 'manifest.json')
+    if os.path.exists(manifest_path):
+        if os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(manifest_path):
+            print(f"Replay store at {store_path} is older than {csv_path}, reading the CSV instead")
+        else:
+            try:
+                return load_replay_store(store_path)
+            except Exception as e:
+                print(f"Failed to load replay store at {store_path}: {e}, reading the CSV instead")
+
+    traffic_data = pd.read_csv(csv_path)
+    # Ensure that columns are correctly named (case-sensitive) and strip spaces
+    traffic_data.columns = traffic_data.columns.str.strip()
+    return traffic_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a CSV replay dataset into a memory-mappable columnar store.")
+    parser.add_argument('csv', help="CSV replay dataset to convert")
+    parser.add_argument('--output', default=None, help="Store directory (default: next to the CSV with a .replay suffix)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = pd.read_csv(args.csv)
+    data.columns = data.columns.str.strip()
+    csv_seconds = time.perf_counter() - start
+
+    store_path = args.output or store_path_for(args.csv)
+    save_replay_store(data, store_path)
+
+    start = time.perf_counter()
+    load_replay_store(store_path)
+    store_seconds = time.perf_counter() - start
+
+    print(f"Converted {len(data)} rows to: {store_path}")
+    print(f"Load time: CSV {csv_seconds:.2f}s, columnar store {store_seconds:.2f}s")
+    print(f"In-memory size: CSV {data.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import numpy as np
+
+
+class AliasSampler:
+    """
+    Walker's alias method for drawing from a fixed discrete distribution in O(1).
+
+    The probabilities are split into equally likely columns, each holding at most two
+    outcomes, so a draw needs one uniform number: pick a column, then pick between its
+    own outcome and its alias.
+    """
+
+    def __init__(self, outcomes, probabilities):
+        self.outcomes = list(outcomes)
+        n = len(self.outcomes)
+        scaled = np.asarray(list(probabilities), dtype=np.float64)
+        scaled = scaled / scaled.sum() * n
+
+        self.probability = np.ones(n)
+        self.alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left is 1 up to rounding error and keeps its own outcome
+
+    def sample(self):
+        """
+        Draw one outcome.
+        """
+        u = np.random.random() * len(self.outcomes)
+        column = int(u)
+        if u - column < self.probability[column]:
+            return self.outcomes[column]
+        return self.outcomes[self.alias[column]]
+
+
+def build_row_index(data, column):
+    """
+    Map every value of column to the NumPy array of row positions holding it.
+    """
+    codes, values = data[column].factorize()
+    order = np.argsort(codes, kind='stable')
+    boundaries = np.searchsorted(codes[order], np.arange(len(values) + 1))
+    return {
+        value: order[boundaries[code]:boundaries[code + 1]]
+        for code, value in enumerate(values)  # Missing values have code -1 and are left out
+    }
+
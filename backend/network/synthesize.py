@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+import numpy as np
+import pandas as pd
+from generate import add_network_columns, enhanced_data_path
+from replay_store import load_traffic_data
+from sampling import build_row_index
+
+# Make the backend modules importable for the model's column list
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+SYNTHESIS_METHODS = ('resample', 'gaussian')
+
+# Columns drawn from the class's observed values even with the gaussian method
+CATEGORICAL_COLUMNS = ['Destination Port']
+
+
+class TrafficSynthesizer:
+    """
+    Draw synthetic flows of each attack type from distributions fitted to a labelled dataset.
+
+    'resample' draws whole rows of the class with replacement, so every flow is one that was
+    observed. 'gaussian' draws from a multivariate normal with the class's feature means and
+    covariance, clipped to the class's observed range and rounded where the feature is
+    integral; categorical columns such as the destination port are still resampled.
+    """
+
+    def __init__(self, data, feature_columns, method='resample', label_column='Attack Type'):
+        self.feature_columns = list(feature_columns)
+        self.method = method
+        self.dtypes = data[self.feature_columns].dtypes
+        rows_by_class = build_row_index(data, label_column)
+        self.classes = list(rows_by_class)
+        self.class_frequencies = np.array([len(rows_by_class[label]) for label in self.classes], dtype=np.float64)
+        self.class_frequencies /= self.class_frequencies.sum()
+
+        features = data[self.feature_columns].to_numpy(dtype=np.float64)
+        self.class_values = {label: features[rows] for label, rows in rows_by_class.items()}
+        self.continuous = np.array([column not in CATEGORICAL_COLUMNS for column in self.feature_columns])
+        self.integral = np.array([np.array_equal(values, np.round(values)) for values in features.T])
+
+        if method == 'gaussian':
+            self.moments = {}
+            for label, values in self.class_values.items():
+                # Infinite rates (zero-duration flows) would make the moments meaningless
+                continuous_values = np.nan_to_num(values[:, self.continuous], nan=0.0, posinf=0.0, neginf=0.0)
+                covariance = (np.cov(continuous_values, rowvar=False) if len(values) > 1
+                              else np.zeros((continuous_values.shape[1],) * 2))
+                self.moments[label] = (
+                    continuous_values.mean(axis=0), covariance,
+                    continuous_values.min(axis=0), continuous_values.max(axis=0)
+                )
+
+    def sample_class(self, rng, label, n):
+        """
+        Draw n flows of one attack type as a feature array.
+        """
+        values = self.class_values[label]
+        sample = values[rng.integers(0, len(values), size=n)]
+        if self.method == 'gaussian':
+            mean, covariance, low, high = self.moments[label]
+            drawn = rng.multivariate_normal(mean, covariance, size=n, method='eigh')
+            sample[:, self.continuous] = np.clip(drawn, low, high)
+            sample[:, self.integral] = np.round(sample[:, self.integral])
+        return sample
+
+    def sample(self, rng, n, mix=None):
+        """
+        Draw n flows with the attack types in the proportions of mix ({attack type: weight}),
+        or in the proportions of the fitted dataset. Returns a shuffled DataFrame.
+        """
+        weights = self.class_frequencies if mix is None else np.array([mix.get(label, 0.0) for label in self.classes])
+        counts = rng.multinomial(n, weights / weights.sum())
+        features = np.concatenate([
+            self.sample_class(rng, label, count) for label, count in zip(self.classes, counts) if count
+        ])
+        labels = np.repeat(np.array(self.classes, dtype=object), counts)
+        order = rng.permutation(n)
+        flows = pd.DataFrame(features[order], columns=self.feature_columns).astype(self.dtypes)
+        flows['Attack Type'] = labels[order]
+        return flows
+
+
+def parse_mix(spec, classes):
+    """
+    Parse an attack mix such as 'BENIGN=0.8,DoS=0.1,DDoS=0.1'; 'balanced' weighs every type equally.
+    """
+    if spec == 'balanced':
+        return {label: 1.0 for label in classes}
+    mix = {}
+    for part in spec.split(','):
+        label, weight = part.rsplit('=', 1)
+        if label.strip() not in classes:
+            raise SystemExit(f"Unknown attack type {label.strip()!r}, expected one of {', '.join(map(str, classes))}")
+        mix[label.strip()] = float(weight)
+    return mix
+
+
+class ChunkWriter:
+    """
+    Append chunks of flows to a CSV file, or to a Parquet file (needs pyarrow) by extension.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._parquet_writer = None
+
+    def write(self, flows):
+        if self.path.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(flows, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            flows.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        self.rows += len(flows)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def post_flows(endpoint, flows, explanation_mode):
+    """
+    Send flows to the batch scoring endpoint and return the number scored.
+    """
+    body = json.dumps({'flows': flows.to_dict(orient='records'), 'explain': explanation_mode}).encode()
+    scoring_request = urllib.request.Request(endpoint, data=body, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(scoring_request, timeout=120) as response:
+        return json.load(response)['count']
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate any number of synthetic flows fitted to the labelled replay dataset, "
+                    "written to a file or sent to the batch scoring endpoint."
+    )
+    parser.add_argument('--data', default=enhanced_data_path, help="Labelled dataset to fit")
+    parser.add_argument('--rows', type=int, default=1000000, help="Number of flows to generate")
+    parser.add_argument('--method', default='resample', choices=SYNTHESIS_METHODS, help="How flows are drawn")
+    parser.add_argument('--mix', default=None,
+                        help="Attack mix as TYPE=WEIGHT,... or 'balanced' (default: the dataset's own mix)")
+    parser.add_argument('--rate', type=float, default=0, help="Flows per second to emit (default: as fast as possible)")
+    parser.add_argument('--chunk-size', type=int, default=100000, help="Flows generated at a time")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--output', default=None, help="CSV or .parquet file to write")
+    parser.add_argument('--endpoint', default=None, help="Scoring URL to POST to, e.g. http://localhost:5000/api/score/batch")
+    parser.add_argument('--batch-size', type=int, default=500, help="Flows per request with --endpoint")
+    parser.add_argument('--explain', default='none', choices=['shap', 'fast', 'none', 'deferred'],
+                        help="Explanation mode requested from the endpoint")
+    args = parser.parse_args()
+
+    if bool(args.output) == bool(args.endpoint):
+        raise SystemExit("Give exactly one of --output or --endpoint")
+
+    # Generating data must not touch the live dashboard's feature statistics
+    os.environ.setdefault('ATTACK_STATS_BACKEND', 'local')
+    from models.nn_model import model_columns
+
+    data = load_traffic_data(args.data)
+    synthesizer = TrafficSynthesizer(data, model_columns, args.method)
+    mix = parse_mix(args.mix, synthesizer.classes) if args.mix else None
+    rng = np.random.default_rng(args.seed)
+    chunk_size = min(args.chunk_size, args.batch_size) if args.endpoint else args.chunk_size
+    if args.rate > 0:
+        # About ten chunks a second keeps the output smooth rather than bursty
+        chunk_size = min(chunk_size, max(1, int(args.rate / 10)))
+    writer = ChunkWriter(args.output) if args.output else None
+
+    rows = 0
+    scored = 0
+    start = time.perf_counter()
+    try:
+        while rows < args.rows:
+            flows = add_network_columns(synthesizer.sample(rng, min(chunk_size, args.rows - rows), mix), rng)
+            if writer is not None:
+                writer.write(flows)
+            else:
+                scored += post_flows(args.endpoint, flows, args.explain)
+            rows += len(flows)
+
+            if args.rate > 0:
+                # Hold the average rate since the start, whatever the size of each chunk
+                time.sleep(max(0.0, rows / args.rate - (time.perf_counter() - start)))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Generated {rows} flows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} flows/s)")
+    if writer is not None:
+        print(f"Synthetic flows saved to: {args.output}")
+    else:
+        print(f"Scored by {args.endpoint}: {scored} flows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# Make the backend modules importable when run as python -m backend.score from the repository root
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from network.flow_ingest import build_column_map, normalise_chunk, iter_flow_chunks, is_cic_export, score_chunk, scored_records
+
+OUTPUT_FORMATS = ('csv', 'parquet')
+
+# 'raw' inputs (CICFlowMeter exports) are standardized before scoring; 'standardized'
+# inputs (the replay dataset's format) are scored as they are; 'auto' tells them apart by header
+INPUT_KINDS = ('auto', 'raw', 'standardized')
+
+
+def input_columns(path):
+    """
+    Column names of a CSV or Parquet flow file.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).schema_arrow.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def is_raw_input(path, input_kind='auto'):
+    """
+    Whether a flow file holds raw features that must be standardized before scoring.
+    """
+    if input_kind == 'auto':
+        return is_cic_export(input_columns(path))
+    return input_kind == 'raw'
+
+
+def iter_input_chunks(path, chunk_size):
+    """
+    Read a CSV or Parquet flow file in chunks of chunk_size rows, normalised for scoring.
+    Both the dataset's own column names and CICFlowMeter's are recognised.
+    """
+    if not path.endswith('.parquet'):
+        yield from iter_flow_chunks(path, chunk_size)
+        return
+
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    column_map = build_column_map(parquet_file.schema_arrow.names)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=list(column_map)):
+        if batch.num_rows:
+            yield normalise_chunk(batch.to_pandas(), column_map)
+
+
+def _init_worker(explanation_mode):
+    """
+    Load the model in a worker process before its first chunk.
+    Back-scoring must not count towards the live dashboard's feature statistics, so the
+    worker keeps its counters private.
+    """
+    os.environ['ATTACK_STATS_BACKEND'] = 'local'
+    from models import nn_model
+
+    nn_model.warm_up()
+    if explanation_mode == 'shap':
+        nn_model.get_explainer()
+    elif explanation_mode == 'fast':
+        nn_model.get_compiled_forest()
+
+
+def _score_chunk(chunk, explanation_mode, raw):
+    """
+    Score one chunk in a worker process, standardizing it first when it holds raw features.
+    Returns the output rows, the count of each prediction and the seconds spent scoring.
+    """
+    from models.nn_model import process_network_traffic
+
+    start = time.perf_counter()
+    if raw:
+        processed = score_chunk(chunk, explanation_mode)
+    else:
+        processed = process_network_traffic(chunk, explanation_mode=explanation_mode)
+    if processed is None:
+        raise RuntimeError(f"Scoring failed for a chunk of {len(chunk)} rows")
+    return scored_records(chunk, processed), Counter(processed['prediction']), time.perf_counter() - start
+
+
+class ScoredFileWriter:
+    """
+    Append scored chunks to one CSV or Parquet output file.
+    """
+
+    def __init__(self, path, output_format):
+        self.path = path
+        self.output_format = output_format
+        self.rows = 0
+        self._parquet_writer = None
+
+    def write(self, records):
+        if self.output_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet_writer is None:
+                # Columns that are empty in the first chunk (e.g. interpretation) are typed as text
+                schema = pa.Schema.from_pandas(records, preserve_index=False)
+                schema = pa.schema([
+                    pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field for field in schema
+                ])
+                self._parquet_writer = pq.ParquetWriter(self.path, schema)
+            table = pa.Table.from_pandas(records, schema=self._parquet_writer.schema, preserve_index=False)
+            self._parquet_writer.write_table(table)
+        else:
+            records.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        self.rows += len(records)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def output_path_for(path, output_dir, output_format):
+    """
+    Path of the scores written for an input file.
+    """
+    name = os.path.basename(path)
+    for extension in ('.csv', '.parquet'):
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+    return os.path.join(output_dir, f"{name}.scored.{output_format}")
+
+
+def score_files(paths, output_dir, output_format='csv', workers=None, chunk_size=20000, explanation_mode='none',
+                input_kind='auto'):
+    """
+    Score every input file with a process pool and write one output file per input.
+
+    The parent process reads the inputs chunk by chunk and keeps at most two chunks per
+    worker in flight, so memory stays flat however large the archive is. Results are
+    written in input order. Returns the rows scored, the count of each prediction and
+    the total seconds the workers spent scoring.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    predictions = Counter()
+    busy_seconds = 0.0
+    rows = 0
+    in_flight = deque()
+    current_writer = None
+
+    def write_oldest():
+        nonlocal busy_seconds, rows, current_writer
+        writer, future = in_flight.popleft()
+        records, chunk_predictions, seconds = future.result()
+        if writer is not current_writer:
+            if current_writer is not None:
+                current_writer.close()
+            current_writer = writer
+        writer.write(records)
+        predictions.update(chunk_predictions)
+        busy_seconds += seconds
+        rows += len(records)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(explanation_mode,)) as executor:
+        for path in paths:
+            writer = ScoredFileWriter(output_path_for(path, output_dir, output_format), output_format)
+            raw = is_raw_input(path, input_kind)
+            for chunk in iter_input_chunks(path, chunk_size):
+                in_flight.append((writer, executor.submit(_score_chunk, chunk, explanation_mode, raw)))
+                if len(in_flight) >= workers * 2:
+                    write_oldest()
+        while in_flight:
+            write_oldest()
+    if current_writer is not None:
+        current_writer.close()
+    return rows, predictions, busy_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score archived flow files in parallel with the current model.")
+    parser.add_argument('paths', nargs='+', help="CSV or Parquet flow files, or glob patterns")
+    parser.add_argument('--output-dir', default=os.path.join(BASE_DIR, 'network', 'scored'),
+                        help="Directory for the scored files")
+    parser.add_argument('--format', default='csv', choices=OUTPUT_FORMATS, help="Output format")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=20000, help="Rows scored per task")
+    parser.add_argument('--explain', default='none', choices=['shap', 'fast', 'none'], help="Explanation mode")
+    parser.add_argument('--input-kind', default='auto', choices=INPUT_KINDS,
+                        help="Whether inputs hold raw CICFlowMeter features or standardized ones (default: by header)")
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.paths for path in glob.glob(pattern)})
+    if not paths:
+        raise SystemExit("No input files found")
+
+    workers = args.workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    rows, predictions, busy_seconds = score_files(
+        paths, args.output_dir, args.format, workers, args.chunk_size, args.explain, args.input_kind
+    )
+    elapsed = time.perf_counter() - start
+
+    summary = ", ".join(f"{label}: {count}" for label, count in predictions.most_common())
+    print(f"Scored {rows} rows from {len(paths)} file(s) in {elapsed:.1f}s with {workers} worker(s)")
+    print(f"Throughput: {rows / max(elapsed, 1e-9):.0f} rows/s, {rows / max(elapsed, 1e-9) / workers:.0f} rows/s per core "
+          f"({rows / max(busy_seconds, 1e-9):.0f} rows/s per core while scoring)")
+    if summary:
+        print(f"Predictions: {summary}")
+    print(f"Scores written to: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+from models.shared_stats import open_shared_segment, _FileLock
+
+# Marks an initialised stream event segment
+SEGMENT_MAGIC = 0x53545245414D3031
+HEADER_SIZE = 5  # magic, slots, slot bytes, instance token, last sequence number
+
+
+class SharedEventLog:
+    """
+    Ring of live traffic stream events in shared memory, written by one producer process
+    and read by every worker.
+
+    Each event gets the next sequence number and is stored as JSON in the slot
+    sequence % slots. The producer is whichever process holds the producer lock, so
+    however many workers serve streams, one loop scores the live traffic and every
+    dashboard sees the same events.
+    """
+
+    def __init__(self, name='projectv2_stream', slots=64, slot_bytes=65536):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        slot_values = 2 + slot_bytes // 8  # sequence number, length, JSON bytes
+        layout = [SEGMENT_MAGIC, slots, slot_bytes]
+        self._lock_path = os.path.join('/tmp', f"{name}.lock")
+        self._producer_lock_path = os.path.join('/tmp', f"{name}.producer.lock")
+        self._producer_file = None
+        self._shm, values = open_shared_segment(name, HEADER_SIZE + slots * slot_values, layout, self._lock_path)
+        self._header = values[:HEADER_SIZE]
+        self._slots = values[HEADER_SIZE:].reshape(slots, slot_values)
+
+    def acquire_producer(self):
+        """
+        Become the producer unless another process is. Returns whether this process is the producer.
+        """
+        if self._producer_file is None:
+            producer_file = open(self._producer_lock_path, 'a')
+            try:
+                fcntl.flock(producer_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                producer_file.close()
+                return False
+            self._producer_file = producer_file
+        return True
+
+    def release_producer(self):
+        """
+        Stop being the producer, letting another process take over.
+        """
+        if self._producer_file is not None:
+            fcntl.flock(self._producer_file, fcntl.LOCK_UN)
+            self._producer_file.close()
+            self._producer_file = None
+
+    @property
+    def is_producer(self):
+        return self._producer_file is not None
+
+    def last_sequence(self):
+        return int(self._header[4])
+
+    def append(self, event):
+        """
+        Store one event after the others.
+        """
+        payload = np.frombuffer(json.dumps(event, default=str).encode(), dtype=np.uint8)
+        if len(payload) > self.slot_bytes:
+            raise ValueError(f"Stream event of {len(payload)} bytes does not fit a {self.slot_bytes} byte slot")
+        with _FileLock(self._lock_path):
+            sequence = int(self._header[4]) + 1
+            slot = self._slots[sequence % self.slots]
+            slot[0], slot[1] = sequence, len(payload)
+            slot[2:].view(np.uint8)[:len(payload)] = payload
+            self._header[4] = sequence
+
+    def read_since(self, sequence):
+        """
+        Get the events stored after sequence, oldest first, and the sequence number of the
+        last one. Events already overwritten by newer ones are skipped.
+        """
+        payloads = []
+        with _FileLock(self._lock_path):
+            last = int(self._header[4])
+            for event_sequence in range(max(sequence + 1, last - self.slots + 1), last + 1):
+                slot = self._slots[event_sequence % self.slots]
+                if int(slot[0]) == event_sequence:
+                    payloads.append(slot[2:].view(np.uint8)[:int(slot[1])].tobytes())
+        return [json.loads(payload) for payload in payloads], last
+
+
+class TrafficBroadcaster:
+    """
+    Fan out events from a single producer loop to every connected client.
+
+    produce is called once per interval and returns the (event type, data) pairs to publish.
+
+    The producer only runs while at least one client is subscribed. Each client gets
+    a bounded queue; when a slow client's queue is full its oldest event is dropped,
+    so one stalled browser tab never holds back the others or grows memory.
+
+    With an event_log shared by several processes, only the process holding its producer
+    lock calls produce, and every process relays the logged events to its own clients
+    every poll_seconds.
+    """
+
+    def __init__(self, produce, interval_seconds=5.0, queue_size=20, event_log=None, poll_seconds=0.25):
+        self.produce = produce
+        self.interval_seconds = interval_seconds
+        self.queue_size = queue_size
+        self.event_log = event_log
+        self.poll_seconds = poll_seconds
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.events_published = 0
+        self.events_dropped = 0
+
+    def subscribe(self):
+        """
+        Register a new client and return its event queue.
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="traffic-broadcaster", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """
+        Remove a client's queue.
+        """
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event_type, data):
+        """
+        Send one event to every subscriber, dropping the oldest queued event of full queues.
+        """
+        event = {'type': event_type, 'data': data}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(event)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                        self.events_dropped += 1
+                    except queue.Empty:
+                        pass
+        self.events_published += 1
+
+    def stats(self):
+        """
+        Get the number of clients and event counters.
+        """
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'events_published': self.events_published,
+                'events_dropped': self.events_dropped,
+                'interval_seconds': self.interval_seconds,
+                'shared': self.event_log is not None,
+                'producer': self.event_log is None or self.event_log.is_producer
+            }
+
+    def _run(self):
+        """
+        Produce one event per interval while anyone is listening, and relay the events of
+        the producing process when there is an event log.
+        """
+        last_sequence = self.event_log.last_sequence() if self.event_log is not None else 0
+        next_tick = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    if self.event_log is not None:
+                        self.event_log.release_producer()
+                    return
+
+            if time.monotonic() >= next_tick and (self.event_log is None or self.event_log.acquire_producer()):
+                next_tick = time.monotonic() + self.interval_seconds
+                try:
+                    for event_type, data in self.produce():
+                        if self.event_log is None:
+                            self.publish(event_type, data)
+                        else:
+                            self.event_log.append({'type': event_type, 'data': data})
+                except Exception as e:
+                    logging.error(f"Error producing live traffic event: {e}")
+
+            if self.event_log is None:
+                time.sleep(max(0.0, next_tick - time.monotonic()))
+                continue
+            try:
+                events, last_sequence = self.event_log.read_since(last_sequence)
+                for event in events:
+                    self.publish(event['type'], event['data'])
+            except Exception as e:
+                logging.error(f"Error relaying live traffic events: {e}")
+            time.sleep(self.poll_seconds)
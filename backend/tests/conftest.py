@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Make the backend modules importable as they are by the app (python -m pytest from backend/)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import uuid
+import numpy as np
+import pandas as pd
+import pytest
+
+# The daemon stores its rows and checkpoints through database.py, which connects on import
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.gettempdir(), f'ingest_test_{uuid.uuid4().hex[:8]}.sqlite')}")
+
+from database import init_db
+import model  # noqa: F401 - registers the ingest tables
+from network import ingest
+from network.flow_ingest import flow_files_path
+
+SAMPLE_FILE = os.path.join(flow_files_path, 'web_attack.pcap_Flow.csv')
+
+
+def fake_score_chunk(chunk, explanation_mode='none'):
+    """
+    Stand-in for the model: fails like the scaler does on values that are not numbers.
+    """
+    features = chunk.drop(columns=['Flow ID', 'Timestamp', 'Label', 'Source IP', 'Destination IP', 'Protocol'],
+                          errors='ignore')
+    features.to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        'Source IP': chunk['Source IP'], 'Destination IP': chunk['Destination IP'],
+        'Source Port': chunk['Source Port'], 'Protocol': chunk['Protocol'],
+        'prediction': 'BENIGN', 'confidence_score': 100.0, 'recommendation': '', 'interpretation': '',
+        'feature_importance': [{}] * len(chunk), 'traffic_stats': [{}] * len(chunk)
+    })
+
+
+@pytest.fixture
+def flow_directory(tmp_path):
+    init_db()
+    with open(SAMPLE_FILE) as sample:
+        lines = sample.read().splitlines()
+    header, rows = lines[0], lines[1:]
+    columns = header.split(',')
+
+    # Poison rows in the middle: text in a numeric column, and trailing fields past the header
+    poisoned = rows[len(rows) // 2].split(',')
+    poisoned[columns.index('Flow Duration')] = 'oops'
+    rows.insert(len(rows) // 2, ','.join(poisoned))
+    rows.insert(len(rows) // 2 + 5, rows[0] + ',extra,fields')
+
+    (tmp_path / f"poison_{uuid.uuid4().hex[:8]}.pcap_Flow.csv").write_text('\n'.join([header] + rows) + '\n')
+    return tmp_path, len(rows)
+
+
+def test_poison_rows_do_not_stop_the_file(flow_directory, monkeypatch):
+    directory, total_rows = flow_directory
+    monkeypatch.setattr(ingest, 'score_chunk', fake_score_chunk)
+    daemon = ingest.FlowIngestDaemon(str(directory), batch_size=50)
+
+    assert daemon.poll() == total_rows
+    assert daemon.batches_failed == 0
+    assert daemon.poll() == 0
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import threading
+import uuid
+import pytest
+
+from models.shared_stats import SharedAttackStats
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_more_threads_than_shards_in_sequence():
+    stats = SharedAttackStats(['DoS'], ['Flow Duration'], shared=False, n_shards=4)
+    for _ in range(20):
+        thread = threading.Thread(target=stats.record, args=('DoS', ['Flow Duration']))
+        thread.start()
+        thread.join()
+    assert stats.as_dict() == {'DoS': {'Flow Duration': 20}}
+
+
+def test_more_greenlets_than_shards_in_one_worker():
+    pytest.importorskip('gevent')
+    # Monkey patching is process-wide, so the gevent worker is simulated in a subprocess
+    name = f"projectv2_stats_test_{uuid.uuid4().hex[:8]}"
+    script = f"""
+from gevent import monkey
+monkey.patch_all()
+import os
+import gevent
+from models.shared_stats import SharedAttackStats
+
+stats = SharedAttackStats(['DoS'], ['Flow Duration'], shared=True, name={name!r}, n_shards=8)
+try:
+    gevent.joinall([gevent.spawn(stats.record, 'DoS', ['Flow Duration']) for _ in range(50)], raise_error=True)
+    for _ in range(50):
+        gevent.spawn(stats.record, 'DoS', ['Flow Duration']).get()
+    print(stats.as_dict()['DoS']['Flow Duration'])
+finally:
+    stats._shm.unlink()
+    os.remove(stats._lock_path)
+"""
+    result = subprocess.run([sys.executable, '-c', script], cwd=BASE_DIR, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '100'
@@ -67,11 +67,16 @@ const Dashboard = () => {
   const [confidenceScores, setConfidenceScores] = useState([]);
   const [featureImportances, setFeatureImportances] = useState([]);
 
-  const fetchTrafficData = async () => {
+  const handleTrafficData = async (trafficEvent) => {
     try {
-      const response = await axios.get("https://projectv2-t1gq.onrender.com/live-traffic");
-      const data = response.data;
-      
+      let data = trafficEvent;
+
+      // When the backend defers explanations, only fetch them for detected attacks
+      if (data.explanation_id && data.prediction !== 'BENIGN') {
+        const explanation = await axios.get(`https://projectv2-t1gq.onrender.com/api/explanations/${data.explanation_id}`);
+        data = { ...data, ...explanation.data };
+      }
+
       // If an attack is detected (prediction is not BENIGN)
       if (data.prediction !== 'BENIGN') {
         const chartContainer = document.querySelector('.chart-container');
@@ -225,11 +230,6 @@ const Dashboard = () => {
         });
       }
 
-      // Update attack feature stats
-      if (data.attack_feature_stats) {
-        setAttackFeatureStats(data.attack_feature_stats);
-      }
-
       // Update confidence scores and feature importances
       setConfidenceScores(prevScores => [...prevScores, data.confidence_score]);
       setFeatureImportances(prevImportances => [...prevImportances, data.feature_importance]);
@@ -240,20 +240,58 @@ const Dashboard = () => {
     }
   };
 
-  useEffect(() => {
-    const fetchData = async () => {
-      await fetchTrafficData();
-    };
+  const fetchTrafficData = async () => {
+    try {
+      const response = await axios.get("https://projectv2-t1gq.onrender.com/live-traffic");
+      await handleTrafficData(response.data);
+      await fetchAttackFeatureStats();
+    } catch (err) {
+      console.error("Failed to fetch traffic data", err);
+    }
+  };
 
-    fetchData(); // Initial fetch
-    
-    // Only set up the interval if not paused
+  // Aggregate feature statistics are served separately; the browser revalidates them with their ETag
+  const fetchAttackFeatureStats = async () => {
+    try {
+      const response = await axios.get("https://projectv2-t1gq.onrender.com/api/attack-feature-stats");
+      setAttackFeatureStats(response.data.stats);
+    } catch (err) {
+      console.error("Failed to fetch attack feature stats", err);
+    }
+  };
+
+  // Merge the statistics that changed since the previous stream event
+  const handleStatsChanges = (statsEvent) => {
+    setAttackFeatureStats(prevStats => {
+      const updatedStats = { ...prevStats };
+      Object.entries(statsEvent.changes).forEach(([attackType, features]) => {
+        updatedStats[attackType] = { ...(updatedStats[attackType] || {}), ...features };
+      });
+      return updatedStats;
+    });
+  };
+
+  useEffect(() => {
+    // Prefer the server-pushed stream, which is shared by every open dashboard
+    let source;
     let interval;
     if (!isPaused) {
-      interval = setInterval(fetchData, 5000);
+      if (window.EventSource) {
+        fetchAttackFeatureStats(); // Full statistics once, then changes from the stream
+        source = new EventSource("https://projectv2-t1gq.onrender.com/live-traffic/stream");
+        source.addEventListener("traffic", (event) => handleTrafficData(JSON.parse(event.data)));
+        source.addEventListener("stats", (event) => handleStatsChanges(JSON.parse(event.data)));
+      } else {
+        // Fall back to polling in browsers without EventSource
+        fetchTrafficData(); // Initial fetch
+        interval = setInterval(fetchTrafficData, 5000);
+      }
     }
     
     return () => {
+      if (source) {
+        source.close();
+      }
       if (interval) {
         clearInterval(interval);
       }